@@ -0,0 +1,56 @@
+# Compares htmltext.extract_text with the old BeautifulSoup clean_web_content on saved pages.
+# Usage: python benchmarks/bench_htmltext.py [repeats]
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import htmltext
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_fetch_and_clean(html):
+    """The previous path: fetch_web_content's str(soup) round trip, then clean_web_content."""
+    html = str(BeautifulSoup(html, 'html.parser'))
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+    filtered_text = []
+    for tag in soup(['div', 'span', 'p']):
+        filtered_text.append(tag.get_text(strip=True))
+    return ' '.join(filtered_text).strip()
+
+
+def timed(func, html, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = func(html)
+    return (time.perf_counter() - start) / repeats, result
+
+
+def main(repeats=20):
+    if BeautifulSoup is None:
+        print("beautifulsoup4 is not installed; only the new extractor is measured.")
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        print(f"{os.path.basename(path)} ({len(html) // 1024} KB of HTML)")
+        seconds, text = timed(htmltext.extract_text, html, repeats)
+        print(f"  extract_text:       {seconds * 1000:8.2f} ms  {len(text):7d} chars")
+        seconds, text = timed(lambda page: htmltext.extract_text(page, max_chars=10 ** 9), html, repeats)
+        print(f"  extract_text (all): {seconds * 1000:8.2f} ms  {len(text):7d} chars")
+        if BeautifulSoup is not None:
+            seconds, text = timed(legacy_fetch_and_clean, html, repeats)
+            print(f"  BeautifulSoup path: {seconds * 1000:8.2f} ms  {len(text):7d} chars")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,134 @@
+# Load test for server.py: simulates many clients holding conversations at the same time and
+# reports reply latency, time to the first sentence and how evenly the clients were served.
+# With --stub the server and a stub Ollama run in this process from a scratch directory, so the
+# test needs no GPU; otherwise it connects to a server that is already running.
+# Usage: python benchmarks/load_clients.py [--clients 20] [--turns 10] [--stub]
+#                                          [--host 127.0.0.1 --port 8765] [--think-ms 200]
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, BENCH_DIR)
+
+import replay
+import stub_ollama
+
+
+async def client(number, host, port, utterances, turns, think_ms, results):
+    """One simulated user: sends a turn, waits for the whole reply, pauses, and repeats."""
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def receive():
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return json.loads(line)
+
+    writer.write((json.dumps({"type": "hello", "session": f"load-{number}"}) + "\n").encode("utf-8"))
+    await receive()
+    record = results.setdefault(number, {"turns": [], "first": [], "errors": 0})
+    for turn in range(turns):
+        text = utterances[(number + turn) % len(utterances)]
+        start = time.perf_counter()
+        writer.write((json.dumps({"type": "text", "text": text, "id": turn}) + "\n").encode("utf-8"))
+        await writer.drain()
+        first = None
+        while True:
+            message = await receive()
+            if message["type"] == "sentence" and first is None:
+                first = time.perf_counter() - start
+            elif message["type"] == "reply":
+                break
+            elif message["type"] == "error":
+                record["errors"] += 1
+                break
+        record["turns"].append(time.perf_counter() - start)
+        if first is not None:
+            record["first"].append(first)
+        await asyncio.sleep(random.uniform(0.5, 1.5) * think_ms / 1000)
+    writer.write((json.dumps({"type": "bye"}) + "\n").encode("utf-8"))
+    await writer.drain()
+    await reader.read()   # Wait for the server to hang up so the session is closed on its side too
+    writer.close()
+
+
+async def run(args, utterances):
+    address = (args.host, args.port)
+    server_task = None
+    if args.stub:
+        import server
+        bound = asyncio.get_running_loop().create_future()
+        app = server.Server(stub_ollama.MODEL, server.FairScheduler(args.max_concurrent, args.max_pending))
+        server_task = asyncio.create_task(app.serve(args.host, 0, started=bound.set_result))
+        address = await bound
+
+    results = {}
+    started = time.perf_counter()
+    await asyncio.gather(*(client(number, *address, utterances, args.turns, args.think_ms, results)
+                           for number in range(args.clients)))
+    elapsed = time.perf_counter() - started
+
+    if server_task is not None:
+        server_task.cancel()
+        app.close()
+        app.scheduler.print_stats()
+    return results, elapsed
+
+
+def report(results, elapsed):
+    latencies = sorted(t for record in results.values() for t in record["turns"])
+    first = sorted(t for record in results.values() for t in record["first"])
+    means = sorted(sum(record["turns"]) / len(record["turns"]) for record in results.values() if record["turns"])
+    return {
+        "clients": len(results),
+        "turns": len(latencies),
+        "errors": sum(record["errors"] for record in results.values()),
+        "turns_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "reply_p50_ms": round(1000 * replay.percentile(latencies, 0.5), 1),
+        "reply_p95_ms": round(1000 * replay.percentile(latencies, 0.95), 1),
+        "first_sentence_p50_ms": round(1000 * replay.percentile(first, 0.5), 1),
+        "first_sentence_p95_ms": round(1000 * replay.percentile(first, 0.95), 1),
+        # Slowest client's average reply over the fastest one's; 1.0 means everyone was served alike
+        "client_spread": round(means[-1] / means[0], 2) if means and means[0] else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many clients talking to server.py at once.")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=10, help="turns per client")
+    parser.add_argument("--think-ms", type=float, default=200, help="average pause between a reply and the next turn")
+    parser.add_argument("--transcripts", default=replay.TRANSCRIPTS)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stub", action="store_true", help="run the server and a stub Ollama in this process")
+    parser.add_argument("--max-concurrent", type=int, default=4, help="server setting, with --stub")
+    parser.add_argument("--max-pending", type=int, default=4, help="server setting, with --stub")
+    parser.add_argument("--token-ms", type=float, default=2.0, help="stub delay per generated token, with --stub")
+    args = parser.parse_args()
+
+    utterances = replay.load_turns(os.path.abspath(args.transcripts))
+    if args.stub:
+        stub = stub_ollama.StubOllama(token_ms=args.token_ms).start()
+        # Configuration is read when the server's modules are imported, so set it first
+        os.environ["OLLAMA_URL"] = stub.url
+        os.environ.pop("OLLAMA_URLS", None)
+        os.environ.pop("OLLAMA_BACKGROUND_URLS", None)
+        os.environ["TRACE_FILE"] = ""
+        os.chdir(tempfile.mkdtemp(prefix="load-"))
+        print(f"Running the server in {os.getcwd()} against {stub.url}")
+
+    results, elapsed = asyncio.run(run(args, utterances))
+    print(json.dumps(report(results, elapsed), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
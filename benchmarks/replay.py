@@ -0,0 +1,213 @@
+# Replays recorded turns through the assistant's real turn pipeline against the stub Ollama server,
+# then reports turn latency, prompt size and history/memory growth. With --baseline the results are
+# compared to a saved run and the script exits with status 1 if any metric got worse than the
+# tolerance allows. Needs no GPU and no network; everything runs in a scratch directory, and
+# importing the assistant neither installs packages nor starts the TTS engine or keyboard hooks.
+# Usage: python benchmarks/replay.py [--turns 2000] [--transcripts benchmarks/fixtures/turns.txt]
+#                                    [--baseline benchmarks/baseline.json] [--save-baseline]
+# In CI, measure the target branch and the change in the same job, so both runs share a machine:
+#   git worktree add ../base origin/main
+#   python ../base/benchmarks/replay.py --turns 500 --save-baseline --baseline replay-baseline.json
+#   python benchmarks/replay.py --turns 500 --baseline replay-baseline.json
+# An explicit --baseline that does not exist is an error (status 2), so the gate cannot pass unnoticed.
+# Transcripts are a text file with one utterance per line, or a directory of .wav files that are
+# transcribed with talkmod's speech backend first (use the Vosk backend for offline runs).
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import stub_ollama
+
+TRANSCRIPTS = os.path.join(BENCH_DIR, "fixtures", "turns.txt")
+BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+TOLERANCE = 0.2      # Allowed relative slowdown before a metric counts as a regression
+SLACK = {"ms": 2.0, "tokens": 16, "mb": 8.0}   # Absolute noise allowance by metric unit
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def load_turns(source):
+    """Returns the utterances to replay, transcribing .wav files if source is a directory."""
+    if os.path.isdir(source):
+        import talkmod
+        turns = []
+        for path in sorted(glob.glob(os.path.join(source, "*.wav"))):
+            turns.append(talkmod.transcribe_audio(path))
+        return turns
+    with open(source, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def replay(turns, count, sample_every):
+    """Runs count turns through speech25's pipeline and returns raw measurements."""
+    import speech25
+    import pipeline
+
+    first_sentence = {}
+    current = {"turn": 0, "start": 0.0}
+
+    def speak(text, priority=None):
+        # Stands in for the TTS engine: only notes when the first sentence of a turn was ready
+        if current["turn"] not in first_sentence:
+            first_sentence[current["turn"]] = time.perf_counter() - current["start"]
+
+    speech25.speak = speak
+    speech25.model = stub_ollama.MODEL
+    speech25.turn_pipeline.start()
+
+    latencies, local, growth = [], 0, []
+    for number in range(1, count + 1):
+        text = turns[(number - 1) % len(turns)]
+        current.update(turn=number, start=time.perf_counter())
+        if speech25.basefunctions(text):
+            local += 1
+        else:
+            speech25.turn_pipeline.submit(pipeline.Job(user_input=text, turn=number))
+            speech25.turn_pipeline.wait()
+        latencies.append(time.perf_counter() - current["start"])
+        if number % sample_every == 0 or number == count:
+            growth.append({
+                "turn": number,
+                # Entries held in memory (older ones only live in the history store)
+                "history_entries": len(getattr(speech25.conversation_history, "turns", speech25.conversation_history)),
+                "history_bytes": os.path.getsize(speech25.history_store.path),
+                "memory_chunks": len(speech25.memory_index.chunks),
+                "max_rss_mb": max_rss_mb(),
+            })
+            print(f"  turn {number}: {latencies[-1] * 1000:.1f} ms, "
+                  f"{growth[-1]['history_entries']} history entries")
+
+    speech25.turn_pipeline.stop(timeout=5)
+    speech25.command_executor.shutdown()
+    speech25.tracing.tracer.print_summary()
+    return latencies, list(first_sentence.values()), local, growth, speech25.prompts.USE_CHAT
+
+
+def max_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return 0.0   # Not available on Windows
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def summarize(latencies, first_sentence, prompts, growth):
+    """Reduces raw measurements to the metrics stored in a baseline; lower is better for all."""
+    sizes = [tokens for tokens, _ in prompts] or [0]
+    evaluated = [count for _, count in prompts] or [0]
+    tenth = max(1, len(sizes) // 10)
+    last = growth[-1] if growth else {}
+    return {
+        "turn_p50_ms": round(1000 * percentile(latencies, 0.5), 1),
+        "turn_p95_ms": round(1000 * percentile(latencies, 0.95), 1),
+        "first_sentence_p50_ms": round(1000 * percentile(first_sentence, 0.5), 1),
+        "first_sentence_p95_ms": round(1000 * percentile(first_sentence, 0.95), 1),
+        "prompt_p50_tokens": percentile(sizes, 0.5),
+        "prompt_max_tokens": max(sizes),
+        "prompt_growth_tokens": round(sum(sizes[-tenth:]) / tenth - sum(sizes[:tenth]) / tenth, 1),
+        "prefill_p50_tokens": percentile(evaluated, 0.5),
+        "history_entries": last.get("history_entries", 0),
+        "history_mb": round(last.get("history_bytes", 0) / (1024 * 1024), 2),
+        "max_rss_mb": last.get("max_rss_mb", 0.0),
+    }
+
+
+def unit(metric):
+    return metric.rsplit("_", 1)[-1]
+
+
+def compare(results, baseline, tolerance):
+    """Prints each metric against the baseline and returns the names that regressed."""
+    regressed = []
+    for metric, value in results.items():
+        if metric not in baseline:
+            continue
+        allowed = baseline[metric] * (1 + tolerance) + SLACK.get(unit(metric), 0)
+        status = "ok"
+        if value > allowed:
+            status = "REGRESSED"
+            regressed.append(metric)
+        print(f"  {metric:24} {value:>10} baseline {baseline[metric]:>10}  {status}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay turns against a stub Ollama server.")
+    parser.add_argument("--transcripts", default=TRANSCRIPTS, help="text file or directory of .wav files")
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--sample-every", type=int, default=250, help="turns between growth samples")
+    parser.add_argument("--prefill-ms", type=float, default=0.02, help="stub delay per uncached prompt token")
+    parser.add_argument("--token-ms", type=float, default=0.5, help="stub delay per generated token")
+    parser.add_argument("--baseline", help="results to compare with (default: benchmarks/baseline.json if present)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--output", help="also write the results as JSON here")
+    parser.add_argument("--workdir", help="scratch directory for history and caches (default: a temp dir)")
+    args = parser.parse_args()
+
+    turns = load_turns(os.path.abspath(args.transcripts))
+    if not turns:
+        parser.error(f"no turns found in {args.transcripts}")
+    baseline_path = os.path.abspath(args.baseline or BASELINE)
+    if args.baseline and not args.save_baseline and not os.path.exists(baseline_path):
+        parser.error(f"baseline {args.baseline} does not exist; create it with --save-baseline")
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    stub = stub_ollama.StubOllama(prefill_ms=args.prefill_ms, token_ms=args.token_ms).start()
+    # Configuration is read when the assistant's modules are imported, so set it first
+    os.environ["OLLAMA_URL"] = stub.url
+    os.environ.pop("OLLAMA_URLS", None)
+    os.environ.pop("OLLAMA_BACKGROUND_URLS", None)
+    os.environ["TRACE_FILE"] = ""
+    os.chdir(args.workdir or tempfile.mkdtemp(prefix="replay-"))
+    print(f"Replaying {args.turns} turns ({len(turns)} distinct) in {os.getcwd()} against {stub.url}")
+
+    started = time.perf_counter()
+    latencies, first_sentence, local, growth, use_chat = replay(turns, args.turns, args.sample_every)
+    endpoint = "chat" if use_chat else "generate"
+    prompts = [(tokens, evaluated) for name, tokens, evaluated in stub.prompts if name == endpoint]
+    stub.stop()
+
+    results = summarize(latencies, first_sentence, prompts, growth)
+    print(f"Finished in {time.perf_counter() - started:.1f}s; {local} turns answered locally, "
+          f"stub requests: {stub.counts}")
+    print(json.dumps(results, indent=2))
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "growth": growth}, f, indent=2)
+
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+        return 0
+    if not os.path.exists(baseline_path):
+        print("No baseline to compare with; run again with --save-baseline to create one.")
+        return 0
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"Compared with {baseline_path} (tolerance {args.tolerance:.0%}):")
+    regressed = compare(results, baseline, args.tolerance)
+    if regressed:
+        print(f"Performance regressed: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+# Stand-in for the Ollama HTTP API, so turns can be replayed on a machine with no GPU or network.
+# Serves /api/tags, /api/generate, /api/chat and /api/embeddings with configurable prefill and
+# per-token delays. Like Ollama, prompt tokens shared with the previous request count as cached
+# and cost no prefill time.
+# Usage: python benchmarks/stub_ollama.py [--port 11434] [--prefill-ms 0.05] [--token-ms 5]
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import contextbuilder
+
+MODEL = "stub:latest"
+EMBED_DIM = 64
+REPLY = ("This is a canned reply from the stub server. It has a few short sentences. "
+         "The speech queue should get them one at a time. ")
+
+
+def prompt_text(body):
+    """The text Ollama would tokenize for a generate or chat request."""
+    if "messages" in body:
+        return "".join(message.get("content", "") for message in body["messages"])
+    return body.get("system", "") + body.get("prompt", "")
+
+
+def embedding(text, dim=EMBED_DIM):
+    """Deterministic pseudo-embedding so the memory index behaves the same on every run."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [(digest[i % len(digest)] - 128) / 128.0 for i in range(dim)]
+
+
+class StubOllama:
+    """Threaded fake Ollama server. Records every prompt size it sees in self.prompts."""
+
+    def __init__(self, host="127.0.0.1", port=0, models=(MODEL,), prefill_ms=0.05, token_ms=2.0,
+                 reply_tokens=40):
+        self.models = list(models)
+        self.prefill_ms = prefill_ms        # Milliseconds per prompt token that is not cached
+        self.token_ms = token_ms            # Milliseconds per generated token
+        self.reply_tokens = reply_tokens
+        self.lock = threading.Lock()
+        self.last_prompt = ""
+        self.prompts = []                   # (endpoint, prompt tokens, tokens actually evaluated)
+        self.counts = {}
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="stub-ollama", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reply_words(self):
+        words = REPLY.split()
+        return [words[i % len(words)] + " " for i in range(self.reply_tokens)]
+
+    def prefill(self, endpoint, text):
+        """Sleeps for the prefill of whatever part of text is not shared with the last prompt."""
+        tokens = contextbuilder.estimate_tokens(text)
+        with self.lock:
+            shared = len(os.path.commonprefix([self.last_prompt, text]))
+            self.last_prompt = text
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+        evaluated = max(1, tokens - shared // contextbuilder.CHARS_PER_TOKEN)
+        seconds = evaluated * self.prefill_ms / 1000
+        time.sleep(seconds)
+        with self.lock:
+            self.prompts.append((endpoint, tokens, evaluated))
+        return evaluated, seconds
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"    # Keep-alive, like the real server
+
+            def setup(self):
+                super().setup()
+                # Streamed tokens are tiny writes; without this Nagle's algorithm holds them back
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def handle(self):
+                try:
+                    super().handle()
+                except ConnectionResetError:
+                    pass   # The client closed a keep-alive connection, e.g. after stopping a stream
+
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, payload, status=200):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_chunk(self, payload):
+                data = (json.dumps(payload) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/api/tags":
+                    self.send_json({"models": [{"name": name} for name in stub.models]})
+                else:
+                    self.send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                endpoint = self.path.rstrip("/").rsplit("/", 1)[-1]
+                if endpoint == "embeddings":
+                    self.send_json({"embedding": embedding(body.get("prompt", ""))})
+                elif endpoint in ("generate", "chat"):
+                    self.generate(endpoint, body)
+                else:
+                    self.send_json({"error": "not found"}, 404)
+
+            def generate(self, endpoint, body):
+                start = time.perf_counter()
+                text = prompt_text(body)
+                if not text:
+                    # An empty request only loads the model, as in startup warm-up
+                    with stub.lock:
+                        stub.counts["load"] = stub.counts.get("load", 0) + 1
+                    self.send_json({"model": body.get("model"), "response": "", "done": True})
+                    return
+                evaluated, prefill = stub.prefill(endpoint, text)
+                words = stub.reply_words()
+
+                def piece(word, done=False):
+                    if endpoint == "chat":
+                        return {"model": body.get("model"), "message": {"role": "assistant", "content": word}, "done": done}
+                    return {"model": body.get("model"), "response": word, "done": done}
+
+                def final():
+                    chunk = piece("", done=True)
+                    chunk.update({
+                        "total_duration": int((time.perf_counter() - start) * 1e9),
+                        "load_duration": 0,
+                        "prompt_eval_count": evaluated,
+                        "prompt_eval_duration": int(prefill * 1e9),
+                        "eval_count": len(words),
+                        "eval_duration": int(len(words) * stub.token_ms * 1e6),
+                    })
+                    return chunk
+
+                if body.get("stream", True):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    try:
+                        for word in words:
+                            time.sleep(stub.token_ms / 1000)
+                            self.send_chunk(piece(word))
+                        self.send_chunk(final())
+                        self.wfile.write(b"0\r\n\r\n")
+                    except (BrokenPipeError, ConnectionResetError):
+                        self.close_connection = True   # Client stopped reading, e.g. after a barge-in
+                else:
+                    time.sleep(len(words) * stub.token_ms / 1000)
+                    reply = final()
+                    reply.update(piece("".join(words).strip(), done=True))
+                    self.send_json(reply)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server for offline benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--prefill-ms", type=float, default=0.05, help="delay per uncached prompt token")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="delay per generated token")
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    args = parser.parse_args()
+    stub = StubOllama(args.host, args.port, prefill_ms=args.prefill_ms, token_ms=args.token_ms,
+                      reply_tokens=args.reply_tokens)
+    print(f"Stub Ollama listening on {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+
+MAX_CONCURRENT = int(os.environ.get("CMD_MAX_CONCURRENT", 4))   # Commands allowed to run at once
+TIMEOUT = float(os.environ.get("CMD_TIMEOUT", 30))                # Seconds before a command is killed
+MAX_OUTPUT = 8000                                                 # Bytes kept per stream (head + tail)
+
+
+class BoundedBuffer:
+    """Keeps the first and last limit/2 bytes of a stream and counts what was dropped."""
+
+    def __init__(self, limit=MAX_OUTPUT):
+        self.half = limit // 2
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.dropped = 0
+
+    def write(self, data):
+        room = self.half - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            extra = len(self.tail) - self.half
+            if extra > 0:
+                del self.tail[:extra]
+                self.dropped += extra
+
+    def text(self):
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if self.dropped:
+            return f"{head}\n... [{self.dropped} bytes trimmed] ...\n{tail}"
+        return head + tail
+
+
+class CommandResult:
+    """What a command did: exit code, duration, trimmed output and whether it timed out."""
+
+    def __init__(self, command, returncode, duration, stdout, stderr, timed_out=False, error=None):
+        self.command = command
+        self.returncode = returncode
+        self.duration = duration
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timed_out = timed_out
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out and self.error is None
+
+    def status(self):
+        if self.error:
+            return f"Failed to start: {self.error}"
+        if self.timed_out:
+            return f"Killed after {self.duration:.1f}s timeout"
+        return f"Exit code {self.returncode} after {self.duration:.1f}s"
+
+
+class CommandExecutor:
+    """Runs shell commands with a concurrency limit, bounded output capture and a kill timeout."""
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT, timeout=TIMEOUT, max_output=MAX_OUTPUT):
+        self.timeout = timeout
+        self.max_output = max_output
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="cmd")
+        self.running = set()
+        self.lock = threading.Lock()
+
+    def run(self, command, timeout=None):
+        """Runs one command to completion (or timeout) and returns its CommandResult."""
+        timeout = self.timeout if timeout is None else timeout
+        with self.slots, tracing.span("command", command=command):
+            start = time.perf_counter()
+            try:
+                process = subprocess.Popen(command, shell=True, stdin=subprocess.DEVNULL,
+                                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, **_group_kwargs())
+            except OSError as e:
+                return CommandResult(command, None, time.perf_counter() - start, "", "", error=e)
+
+            with self.lock:
+                self.running.add(process)
+            stdout, stderr = BoundedBuffer(self.max_output), BoundedBuffer(self.max_output)
+            readers = [threading.Thread(target=_pump, args=(process.stdout, stdout), daemon=True),
+                       threading.Thread(target=_pump, args=(process.stderr, stderr), daemon=True)]
+            for reader in readers:
+                reader.start()
+
+            timed_out = False
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                timed_out = True
+                _kill_tree(process)
+                process.wait()
+            finally:
+                with self.lock:
+                    self.running.discard(process)
+            for reader in readers:
+                reader.join(timeout=1)
+
+            return CommandResult(command, process.returncode, time.perf_counter() - start,
+                                 stdout.text(), stderr.text(), timed_out=timed_out)
+
+    def submit(self, command, timeout=None):
+        """Starts a command in the background and returns a Future for its CommandResult."""
+        return self.pool.submit(tracing.bind(self.run), command, timeout)
+
+    def run_all(self, commands, timeout=None):
+        """Runs several commands concurrently (up to the limit) and returns results in order."""
+        futures = [self.submit(command, timeout) for command in commands]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        """Kills anything still running, e.g. when the assistant exits."""
+        with self.lock:
+            processes = list(self.running)
+        for process in processes:
+            _kill_tree(process)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _pump(stream, buffer):
+    for block in iter(lambda: stream.read1(4096), b""):
+        buffer.write(block)
+    stream.close()
+
+
+def _group_kwargs():
+    """Starts the shell in its own process group so the whole tree can be killed."""
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def _kill_tree(process):
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        process.kill()
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import threading
+
+# Tokens allowed for conversation history + memory + user task in one prompt.
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", 6000))
+KEEP_RECENT_TURNS = 8       # Newest turns that are always sent word for word (budget permitting)
+MEMORY_SHARE = 0.35         # Fraction of the budget memory.txt may use
+SUMMARY_SHARE = 0.2         # Fraction of the budget the rolling summary may use
+MAX_TURN_TOKENS = 600       # Longest any single verbatim turn may be (web pages, command output)
+CHARS_PER_TOKEN = 4         # Rough average for English text with llama-style tokenizers
+
+SUMMARY_PROMPT = """Summarize the conversation below into a short running summary for an assistant.
+Keep names, decisions, commands that worked or failed, open tasks and reminders. Drop small talk.
+Merge it with the existing summary so nothing important from it is lost. Answer with the summary only.
+
+Existing Summary:
+{summary}
+
+New Conversation:
+{turns}
+"""
+
+
+def estimate_tokens(text):
+    """Cheap token estimate; good enough to keep prompts inside the context window."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def trim_to_tokens(text, tokens, keep="end"):
+    """Cuts text down to about the given number of tokens, keeping its start or its end."""
+    limit = max(0, tokens) * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    if keep == "start":
+        return text[:limit] + " ..."
+    return "... " + text[-limit:]
+
+
+class ContextBuilder:
+    """Builds the history and memory sections of a prompt inside a fixed token budget.
+
+    The newest turns are kept verbatim. Older turns are folded in batches into a rolling
+    summary written by the LLM, and each summary is cached so it is only ever produced once.
+    build() never waits on the LLM: it only notes that a fold is due, and fold() (or
+    fold_in_background() after the turn) writes the new summary. Until it is ready, prompts
+    use the previous one.
+    """
+
+    def __init__(self, summarize, budget=PROMPT_TOKEN_BUDGET, keep_recent=KEEP_RECENT_TURNS):
+        self.summarize = summarize          # Callable taking a prompt, returning text or None on failure
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.summary = ""
+        self.summarized_upto = 0            # History entries before this index are in the summary
+        self.fold_upto = 0                  # Entries before this index are due to be folded in
+        self.summary_cache = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def build(self, history, memory, reserved=0):
+        """Returns (history_text, memory_text) that together fit in budget - reserved tokens."""
+        available = max(0, self.budget - reserved)
+        with self.lock:
+            if self.summarized_upto > len(history):
+                self._reset()
+            summary, summarized_upto = self.summary, self.summarized_upto
+
+        memory_text = trim_to_tokens(memory, int(available * MEMORY_SHARE))
+        available -= estimate_tokens(memory_text)
+
+        # Fold older turns into the summary once enough of them have piled up
+        if len(history) - summarized_upto >= 2 * self.keep_recent:
+            self._request_fold(len(history) - self.keep_recent)
+
+        summary_text = trim_to_tokens(summary, int(self.budget * SUMMARY_SHARE))
+        available -= estimate_tokens(summary_text)
+
+        turns = []
+        for item in reversed(history[summarized_upto:]):
+            text = trim_to_tokens(str(item), MAX_TURN_TOKENS, keep="start")   # Turns cache their rendering
+            cost = estimate_tokens(text)
+            if cost > available:
+                break
+            turns.append(text)
+            available -= cost
+        turns.reverse()
+
+        dropped = len(history) - summarized_upto - len(turns)
+        if dropped > 0:
+            # Turns that no longer fit are summarized next so they are not silently lost for good
+            self._request_fold(summarized_upto + dropped)
+
+        sections = []
+        if summary_text:
+            sections.append(f"Summary of earlier conversation: {summary_text}")
+        sections.extend(turns)
+        return "\n".join(sections), memory_text
+
+    def _request_fold(self, upto):
+        with self.lock:
+            self.fold_upto = max(self.fold_upto, upto)
+
+    def fold(self, history):
+        """Merges the turns build() found due into the rolling summary. Returns True if it changed.
+
+        The LLM call is made without holding the lock, so build() can run meanwhile.
+        """
+        with self.lock:
+            summary, start, upto = self.summary, self.summarized_upto, min(self.fold_upto, len(history))
+        if upto <= start:
+            return False
+        turns = "\n".join(trim_to_tokens(str(item), MAX_TURN_TOKENS, keep="start")
+                          for item in history[start:upto])
+        key = hashlib.sha256((summary + "\0" + turns).encode("utf-8")).hexdigest()
+        new_summary = self.summary_cache.get(key)
+        if new_summary is None:
+            new_summary = self.summarize(SUMMARY_PROMPT.format(summary=summary or "(none)", turns=turns))
+            if not new_summary:
+                return False   # Summarizer unavailable; try again after a later turn
+        with self.lock:
+            self.summary_cache[key] = new_summary
+            if (self.summary, self.summarized_upto) != (summary, start):
+                return False   # Reset while the summary was being written
+            self.summary = new_summary
+            self.summarized_upto = upto
+        return True
+
+    def fold_in_background(self, history):
+        """Runs fold() on a daemon thread if a fold is due and none is running yet."""
+        with self.lock:
+            if self.fold_upto <= self.summarized_upto or (self.thread and self.thread.is_alive()):
+                return None
+            self.thread = threading.Thread(target=self._fold_quietly, args=(history,),
+                                           name="context-fold", daemon=True)
+            self.thread.start()
+            return self.thread
+
+    def _fold_quietly(self, history):
+        try:
+            self.fold(history)
+        except Exception as e:
+            print(f"Error summarizing conversation history: {e}")
+
+    def reset(self):
+        """Forgets the rolling summary, e.g. after the history list was replaced."""
+        with self.lock:
+            self._reset()
+
+    def _reset(self):
+        self.summary = ""
+        self.summarized_upto = 0
+        self.fold_upto = 0
@@ -0,0 +1,165 @@
+import json
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+import turns
+
+HISTORY_FILE = "conversation_history.jsonl"
+INDEX_ENTRY = struct.Struct("<dq")   # (timestamp, byte offset) for every record
+
+
+class HistoryStore:
+    """Append-only JSONL log of conversation turns with a sidecar offset index.
+
+    Every record is written exactly once. The index keeps the byte offset and timestamp of each
+    record so recent-N and time-range reads seek straight to the lines they need.
+    """
+
+    def __init__(self, path=HISTORY_FILE):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.marks_path = path + ".marks"
+        self.offsets = array("q")
+        self.timestamps = array("d")
+        self.lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self):
+        """Loads the offset index, rebuilding any part that is missing or out of date."""
+        index_size = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                raw = f.read()
+            index_size = len(raw)
+            usable = index_size - index_size % INDEX_ENTRY.size
+            for timestamp, offset in INDEX_ENTRY.iter_unpack(raw[:usable]):
+                self.timestamps.append(timestamp)
+                self.offsets.append(offset)
+
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        # Drop index entries that point past the end of the log (e.g. the log was truncated)
+        while self.offsets and self.offsets[-1] >= size:
+            self.offsets.pop()
+            self.timestamps.pop()
+
+        start = self._end_of_last_record()
+        if start < size:
+            self._scan_from(start)
+        if len(self.offsets) * INDEX_ENTRY.size != index_size:
+            self._write_index()
+
+    def _end_of_last_record(self):
+        """Returns the byte offset just after the last indexed record."""
+        if not self.offsets:
+            return 0
+        with open(self.path, "rb") as f:
+            f.seek(self.offsets[-1])
+            f.readline()
+            return f.tell()
+
+    def _scan_from(self, offset):
+        """Indexes records that were appended without an index entry."""
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while True:
+                position = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if not line.endswith(b"\n"):
+                    break   # Half-written record from a crash; the next append starts a fresh line
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self.offsets.append(position)
+                self.timestamps.append(float(record.get("ts", 0)))
+
+    def _write_index(self):
+        with open(self.index_path, "wb") as f:
+            for timestamp, offset in zip(self.timestamps, self.offsets):
+                f.write(INDEX_ENTRY.pack(timestamp, offset))
+
+    def append(self, entry, timestamp=None):
+        """Appends one conversation entry (a Turn's to_entry() dict, or a plain string or dict) and returns its record number."""
+        record = {"ts": timestamp or time.time(), "entry": entry}
+        line = (json.dumps(record, default=str) + "\n").encode("utf-8")
+        with self.lock:
+            with open(self.path, "ab") as f:
+                if f.tell() and not self._ends_with_newline():
+                    f.write(b"\n")
+                offset = f.tell()
+                f.write(line)
+            with open(self.index_path, "ab") as f:
+                f.write(INDEX_ENTRY.pack(record["ts"], offset))
+            self.offsets.append(offset)
+            self.timestamps.append(record["ts"])
+            return len(self.offsets) - 1
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _read_range(self, start, stop):
+        """Reads records start..stop-1, seeking to each indexed offset."""
+        records = []
+        if start >= stop:
+            return records
+        with open(self.path, "rb") as f:
+            for i in range(start, stop):
+                f.seek(self.offsets[i])
+                records.append(json.loads(f.readline()))
+        return records
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def recent(self, n):
+        """Returns the last n records, oldest first."""
+        with self.lock:
+            return self._read_range(max(0, len(self.offsets) - n), len(self.offsets))
+
+    def between(self, start_time, end_time=None):
+        """Returns records whose timestamp falls in [start_time, end_time]."""
+        with self.lock:
+            first = bisect_left(self.timestamps, start_time)
+            last = len(self.timestamps) if end_time is None else bisect_right(self.timestamps, end_time)
+            return self._read_range(first, last)
+
+    def read_from(self, position, limit=None):
+        """Returns records from record number position onwards, at most limit of them."""
+        with self.lock:
+            stop = len(self.offsets) if limit is None else min(len(self.offsets), position + limit)
+            return self._read_range(position, stop)
+
+
+    def get_mark(self, name):
+        """Returns a named high-water mark (a record number), 0 if it was never set."""
+        try:
+            with open(self.marks_path, "r", encoding="utf-8") as f:
+                return int(json.load(f).get(name, 0))
+        except (OSError, ValueError):
+            return 0
+
+    def set_mark(self, name, position):
+        """Saves a named high-water mark, e.g. how far background jobs have processed the log."""
+        with self.lock:
+            try:
+                with open(self.marks_path, "r", encoding="utf-8") as f:
+                    marks = json.load(f)
+            except (OSError, ValueError):
+                marks = {}
+            marks[name] = position
+            with open(self.marks_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(marks, f)
+            os.replace(self.marks_path + ".tmp", self.marks_path)
+
+
+def format_records(records):
+    """Renders stored records as plain text lines for prompts and summaries."""
+    return "\n".join(turns.render_entry(record["entry"]) for record in records)
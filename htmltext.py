@@ -0,0 +1,103 @@
+import re
+from html.parser import HTMLParser
+
+MAX_CHARS = 12000      # Stop extracting once this much text has been collected
+FEED_SIZE = 65536      # HTML is parsed in pieces so big pages can be abandoned early
+
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "canvas"}
+KEEP_IN_HEAD = {"title"}
+# Tags that may appear in <head>. Any other tag starts the body, because HTML5 lets pages leave out
+# </head> and <body>.
+HEAD_TAGS = {"title", "meta", "link", "script", "style", "noscript", "template", "base"}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "header", "footer", "nav", "aside", "li", "ul", "ol",
+    "table", "tr", "td", "th", "h1", "h2", "h3", "h4", "h5", "h6", "br", "hr", "blockquote", "pre",
+    "title", "form", "dd", "dt", "figcaption",
+}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+WHITESPACE = re.compile(r"\s+")
+
+
+class _Done(Exception):
+    """Raised to stop parsing once enough text has been collected."""
+
+
+class TextExtractor(HTMLParser):
+    """Single-pass HTML to text converter.
+
+    Every text node is visited exactly once, so nested tags never repeat their text. Script and
+    style content is skipped, identical blocks (repeated menus, footers) are only kept once,
+    and parsing stops as soon as max_chars of text have been collected.
+    """
+
+    def __init__(self, max_chars=MAX_CHARS):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.blocks = []
+        self.current = []
+        self.seen = set()
+        self.length = 0
+        self.skip_depth = 0
+        self.in_head = False
+        self.in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "head":
+            self.in_head = True
+            return
+        if self.in_head and tag not in HEAD_TAGS:
+            self.in_head = False
+        if tag in VOID_TAGS:
+            if tag in BLOCK_TAGS:
+                self._end_block()
+            return
+        if tag in KEEP_IN_HEAD:
+            self.in_title = True
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._end_block()
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self.in_head = False
+        if tag in KEEP_IN_HEAD:
+            self.in_title = False
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self._end_block()
+
+    def handle_data(self, data):
+        if (self.skip_depth or self.in_head) and not self.in_title:
+            return
+        self.current.append(data)
+
+    def _end_block(self):
+        if not self.current:
+            return
+        text = WHITESPACE.sub(" ", "".join(self.current)).strip()
+        self.current = []
+        if not text or text in self.seen:
+            return
+        self.seen.add(text)
+        self.blocks.append(text)
+        self.length += len(text) + 1
+        if self.length >= self.max_chars:
+            raise _Done()
+
+    def text(self):
+        return "\n".join(self.blocks)[:self.max_chars]
+
+
+def extract_text(html, max_chars=MAX_CHARS):
+    """Returns the readable text of an HTML page, at most max_chars characters long."""
+    parser = TextExtractor(max_chars)
+    try:
+        for start in range(0, len(html), FEED_SIZE):
+            parser.feed(html[start:start + FEED_SIZE])
+        parser.close()
+        parser._end_block()
+    except _Done:
+        pass
+    return parser.text()
@@ -0,0 +1,158 @@
+import difflib
+import importlib.util
+import os
+import re
+
+WORD_CUTOFF = 0.8        # How alike two words must be to count as the same (typos, "whats"/"what's")
+FUZZY_CUTOFF = 0.85      # Average word similarity a fuzzy phrase match needs
+PLUGIN_DIR = "plugins"   # Every .py file here is imported at startup and may register intents
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize(text):
+    """Lowercases text and strips punctuation so "What's the time?" matches "whats the time"."""
+    return " ".join(PUNCTUATION.sub("", text.lower()).split())
+
+
+def _tokens(text):
+    """Returns (normalized word, original word) pairs, skipping punctuation-only words."""
+    pairs = []
+    for word in text.split():
+        normalized = normalize(word)
+        if normalized:
+            pairs.append((normalized, word))
+    return pairs
+
+
+def fuzzy_score(words, phrase):
+    """Scores how closely the input words match phrase, word for word.
+
+    Only inputs with as many words as the phrase are compared, so "what time is it in tokyo"
+    never counts as "what time is it", and every word must be a close match ("wat time is it"),
+    so "what date is it" never matches either. Returns the average word similarity, or 0.0.
+    """
+    if len(words) != len(phrase):
+        return 0.0
+    total = 0.0
+    for word, wanted in zip(words, phrase):
+        ratio = 1.0 if word == wanted else difflib.SequenceMatcher(None, word, wanted).ratio()
+        if ratio < WORD_CUTOFF:
+            return 0.0
+        total += ratio
+    return total / len(phrase)
+
+
+class Intent:
+    """A local command: the phrases or regex patterns that trigger it and the handler that runs it.
+
+    handler(text, argument) gets the original text and, for takes_args phrases, whatever followed
+    the phrase (or the regex match for patterns). A handler may return False to decline.
+    """
+
+    def __init__(self, name, handler, phrases=(), patterns=(), takes_args=False, fuzzy=True):
+        self.name = name
+        self.handler = handler
+        self.phrases = [normalize(phrase) for phrase in phrases]
+        self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        self.takes_args = takes_args
+        self.fuzzy = fuzzy
+
+
+class IntentRouter:
+    """Matches user input against registered intents without calling the LLM.
+
+    Phrases live in a word trie, so exact commands and "phrase + argument" commands are found in
+    one walk over the words. Regex patterns are tried next, then fuzzy matching on whole phrases.
+    """
+
+    def __init__(self, fuzzy_cutoff=FUZZY_CUTOFF):
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.intents = {}
+        self.trie = {}
+        self.fuzzy_phrases = {}   # phrase -> intent for fuzzy matching
+
+    def register(self, name, handler, phrases=(), patterns=(), takes_args=False, fuzzy=True):
+        intent = Intent(name, handler, phrases, patterns, takes_args, fuzzy)
+        self.intents[name] = intent
+        for phrase in intent.phrases:
+            node = self.trie
+            for word in phrase.split():
+                node = node.setdefault(word, {})
+            node[None] = intent
+            if fuzzy and not takes_args:
+                self.fuzzy_phrases[phrase] = intent
+        return intent
+
+    def intent(self, name, phrases=(), patterns=(), takes_args=False, fuzzy=True):
+        """Decorator form of register() for plugins."""
+        def decorate(handler):
+            self.register(name, handler, phrases, patterns, takes_args, fuzzy)
+            return handler
+        return decorate
+
+    def match(self, text):
+        """Returns (intent, argument, score) for the best confident match, or None."""
+        tokens = _tokens(text)
+        words = [word for word, _ in tokens]
+        if not words:
+            return None
+
+        # Longest phrase in the trie that the input starts with
+        node, best = self.trie, None
+        for position, word in enumerate(words):
+            node = node.get(word)
+            if node is None:
+                break
+            intent = node.get(None)
+            if intent and (position + 1 == len(words) or intent.takes_args):
+                best = (intent, " ".join(original for _, original in tokens[position + 1:]), 1.0)
+        if best:
+            return best
+
+        for intent in self.intents.values():
+            for pattern in intent.patterns:
+                found = pattern.fullmatch(text.strip())
+                if found:
+                    return intent, found, 1.0
+
+        best_score, best_intent = 0.0, None
+        for phrase, intent in self.fuzzy_phrases.items():
+            score = fuzzy_score(words, phrase.split())
+            if score > best_score:
+                best_score, best_intent = score, intent
+        if best_score >= self.fuzzy_cutoff:
+            return best_intent, "", best_score
+        return None
+
+    def handle(self, text):
+        """Runs the matching intent. Returns its name if the turn was handled locally, else None."""
+        found = self.match(text)
+        if not found:
+            return None
+        intent, argument, score = found
+        if intent.handler(text, argument) is False:
+            return None
+        return intent.name
+
+
+router = IntentRouter()
+intent = router.intent
+
+
+def load_plugins(directory=PLUGIN_DIR):
+    """Imports every plugin module in directory; plugins register with @intents.intent(...)."""
+    if not os.path.isdir(directory):
+        return []
+    loaded = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".py") or filename.startswith("_"):
+            continue
+        name = f"plugin_{filename[:-3]}"
+        try:
+            spec = importlib.util.spec_from_file_location(name, os.path.join(directory, filename))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            loaded.append(name)
+        except Exception as e:
+            print(f"Error loading plugin {filename}: {e}")
+    return loaded
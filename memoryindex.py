@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import threading
+
+import requests
+
+import ollamaclient
+
+try:
+    import numpy as np
+except ImportError:   # Retrieval is skipped and the whole memory file is used instead
+    np = None
+
+EMBED_MODEL = os.environ.get("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+INDEX_PATH = "memory_index"     # Writes memory_index.npy (vectors) and memory_index.json (chunks)
+CHUNK_CHARS = 800
+TOP_K = 6
+
+
+def chunk_text(text, size=CHUNK_CHARS):
+    """Splits text into chunks of roughly size characters along paragraph and line breaks."""
+    chunks = []
+    current = ""
+    for block in text.replace("\r\n", "\n").split("\n"):
+        block = block.strip()
+        if not block:
+            continue
+        while len(block) > size:
+            chunks.append(block[:size])
+            block = block[size:]
+        if current and len(current) + len(block) + 1 > size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{block}" if current else block
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class MemoryIndex:
+    """On-disk embedding index over memory.txt and past turns, searched by cosine similarity.
+
+    Embeddings are cached by content hash, so a chunk is sent to /api/embeddings only the first
+    time it is seen. Chunks keep a set of sources; a chunk with no sources stays cached but is
+    left out of searches.
+    """
+
+    def __init__(self, path=INDEX_PATH, model=EMBED_MODEL, client=None):
+        self.path = path
+        self.model = model
+        self.client = client or ollamaclient.client
+        self.lock = threading.Lock()
+        self.chunks = []          # [{"hash", "text", "sources"}], row i matches vectors[i]
+        self.rows = {}            # hash -> row number
+        self.vectors = None
+        self.dirty = False
+        self.load()
+
+    @property
+    def enabled(self):
+        return np is not None
+
+    def load(self):
+        """Loads the index from disk if it was saved before."""
+        if not self.enabled or not os.path.exists(self.path + ".json"):
+            return
+        try:
+            with open(self.path + ".json", "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            vectors = np.load(self.path + ".npy")
+            if len(chunks) != len(vectors):
+                raise ValueError("chunk list and vectors do not match")
+        except Exception as e:
+            print(f"Error loading memory index, starting a new one: {e}")
+            return
+        self.chunks = [dict(chunk, sources=set(chunk["sources"])) for chunk in chunks]
+        self.rows = {chunk["hash"]: i for i, chunk in enumerate(self.chunks)}
+        self.vectors = vectors
+
+    def save(self):
+        """Writes the index to disk if anything changed since the last save."""
+        if not self.enabled or not self.dirty:
+            return
+        with self.lock:
+            chunks = [dict(chunk, sources=sorted(chunk["sources"])) for chunk in self.chunks]
+            with open(self.path + ".json.tmp", "w", encoding="utf-8") as f:
+                json.dump(chunks, f)
+            with open(self.path + ".npy.tmp", "wb") as f:
+                np.save(f, self.vectors)
+            os.replace(self.path + ".npy.tmp", self.path + ".npy")
+            os.replace(self.path + ".json.tmp", self.path + ".json")
+            self.dirty = False
+
+    def embed(self, text):
+        """Returns the normalized embedding of text from Ollama."""
+        response = self.client.post("embeddings", json={"model": self.model, "prompt": text})
+        vector = np.asarray(response.json()["embedding"], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _add_chunk(self, text, source):
+        key = content_hash(text)
+        with self.lock:
+            row = self.rows.get(key)
+            if row is not None:
+                self._add_source(row, source)
+                return
+        vector = self.embed(text)   # Outside the lock: it is a round trip to Ollama
+        with self.lock:
+            row = self.rows.get(key)
+            if row is not None:   # Another thread embedded the same chunk meanwhile
+                self._add_source(row, source)
+                return
+            if self.vectors is None:
+                self.vectors = vector[np.newaxis, :]
+            else:
+                self.vectors = np.vstack([self.vectors, vector])
+            self.rows[key] = len(self.chunks)
+            self.chunks.append({"hash": key, "text": text, "sources": {source}})
+        self.dirty = True
+
+    def _add_source(self, row, source):
+        # Called with self.lock held, since save() and search() read the source sets
+        sources = self.chunks[row]["sources"]
+        if source not in sources:
+            sources.add(source)
+            self.dirty = True
+
+    def add(self, source, text):
+        """Adds text (chunked) under source, embedding only chunks not seen before."""
+        if not self.enabled:
+            return
+        for chunk in chunk_text(text):
+            self._add_chunk(chunk, source)
+
+    def sync(self, source, text):
+        """Makes the chunks of source match text exactly, e.g. after memory.txt was rewritten."""
+        if not self.enabled:
+            return
+        wanted = set()
+        for chunk in chunk_text(text):
+            self._add_chunk(chunk, source)
+            wanted.add(content_hash(chunk))
+        with self.lock:
+            for chunk in self.chunks:
+                if source in chunk["sources"] and chunk["hash"] not in wanted:
+                    chunk["sources"].discard(source)
+                    self.dirty = True
+
+    def search(self, query, k=TOP_K):
+        """Returns the k chunks most similar to query, best first, as (score, text, sources)."""
+        if not self.enabled or self.vectors is None or not query.strip():
+            return []
+        vector = self.embed(query)
+        with self.lock:
+            active = np.fromiter((bool(chunk["sources"]) for chunk in self.chunks), dtype=bool, count=len(self.chunks))
+            scores = self.vectors @ vector
+            scores[~active] = -np.inf
+            k = min(k, int(active.sum()))
+            if k <= 0:
+                return []
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [(float(scores[i]), self.chunks[i]["text"], sorted(self.chunks[i]["sources"])) for i in best]
+
+
+def format_results(results):
+    """Renders search results for the Memory Catalog section of a prompt."""
+    return "\n---\n".join(f"[{', '.join(sources)}] {text}" for _, text, sources in results)
+
+
+def safe_search(index, query, k=TOP_K):
+    """Searches index, returning None if embeddings are unavailable so callers can fall back."""
+    if not index.enabled or index.vectors is None:
+        return None
+    try:
+        return index.search(query, k)
+    except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+        print(f"Memory search unavailable: {e}")
+        return None
@@ -0,0 +1,135 @@
+import difflib
+import os
+import re
+import threading
+import time
+
+import historystore
+
+BATCH_SIZE = 40          # History records sent to the model per refinement call
+INTERVAL = 600           # Seconds between background passes
+MARK = "memory"          # Name of the high-water mark kept in the history store
+SIMILAR = 0.9            # Facts at least this alike are treated as duplicates
+BULLET = re.compile(r"^\s*(?:[-*\u2022]|\d+[.)])\s*")
+
+REFINE_PROMPT = """Analyze the conversation history and extract key details that contribute to successful outcomes.
+Only list NEW facts that are not already in the current memory: user preferences, commands that worked,
+fixes for errors, reminders and other details worth recalling later.
+Answer with one fact per line, each line starting with "- ". Answer "- none" if there is nothing new.
+
+Current Memory:
+{memory}
+
+Conversational History:
+{history}
+"""
+
+
+def parse_memory(text):
+    """Splits a memory file into fact strings (one per line, bullets and numbering removed)."""
+    facts = []
+    for line in text.splitlines():
+        fact = BULLET.sub("", line).strip()
+        if fact and not fact.startswith("#"):
+            facts.append(fact)
+    return facts
+
+
+def merge_facts(facts, new_facts):
+    """Adds new_facts to facts, skipping exact and near duplicates. Returns how many were added."""
+    seen = {fact.lower() for fact in facts}
+    added = 0
+    for fact in new_facts:
+        key = fact.lower()
+        if key in ("none", "nothing new") or key in seen:
+            continue
+        if any(difflib.SequenceMatcher(None, key, old).ratio() >= SIMILAR for old in seen):
+            continue
+        facts.append(fact)
+        seen.add(key)
+        added += 1
+    return added
+
+
+def write_memory(path, facts):
+    """Rewrites the memory file atomically so readers never see half of it."""
+    content = "# Memory\n" + "".join(f"- {fact}\n" for fact in facts)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(path + ".tmp", path)
+
+
+class MemoryRefiner:
+    """Background job that folds new conversation turns into memory.txt in fixed-size batches.
+
+    A high-water mark in the history store records how far it got, so each turn is only ever
+    sent to the model once, and the memory file is rewritten as a deduplicated list of facts.
+    """
+
+    def __init__(self, store, summarize, memory_path="memory.txt", batch_size=BATCH_SIZE,
+                 interval=INTERVAL, is_idle=None):
+        self.store = store
+        self.summarize = summarize      # Callable taking a prompt, returning text or None on failure
+        self.memory_path = memory_path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.is_idle = is_idle or (lambda: True)
+        self.lock = threading.Lock()    # Only one pass at a time (timer or F7)
+        self.wake = threading.Event()
+        self.thread = None
+
+    def read_facts(self):
+        try:
+            with open(self.memory_path, "r", encoding="utf-8") as f:
+                return parse_memory(f.read())
+        except OSError:
+            return []
+
+    def run_once(self, max_batches=None):
+        """Processes every turn after the high-water mark. Returns the number of facts added."""
+        with self.lock:
+            position = self.store.get_mark(MARK)
+            facts = self.read_facts()
+            added = 0
+            batches = 0
+            while position < len(self.store) and (max_batches is None or batches < max_batches):
+                records = self.store.read_from(position, self.batch_size)
+                reply = self.summarize(REFINE_PROMPT.format(
+                    memory="\n".join(f"- {fact}" for fact in facts) or "(empty)",
+                    history=historystore.format_records(records)))
+                if reply is None:
+                    break   # Model unavailable; the mark stays put and this batch is retried later
+                added += merge_facts(facts, parse_memory(reply))
+                position += len(records)
+                batches += 1
+                write_memory(self.memory_path, facts)
+                self.store.set_mark(MARK, position)
+            return added
+
+    def start(self):
+        """Runs passes in a daemon thread every interval seconds, or when poked, while idle."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._loop, name="memory-refiner", daemon=True)
+            self.thread.start()
+        return self
+
+    def poke(self):
+        """Asks the background thread to run a pass soon."""
+        self.wake.set()
+
+    def _loop(self):
+        while True:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            while not self.is_idle():
+                time.sleep(1)   # Wait for the current turn to finish
+            try:
+                # One batch at a time so a waiting user turn is not held up for long
+                while self.is_idle():
+                    before = self.store.get_mark(MARK)
+                    self.run_once(max_batches=1)
+                    after = self.store.get_mark(MARK)
+                    if after == before or after >= len(self.store):
+                        break
+            except Exception as e:
+                print(f"Error refining memory: {e}")
@@ -0,0 +1,420 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import tracing
+
+# Where the Ollama API lives. Override with the OLLAMA_URL environment variable, or list several
+# servers (comma separated) in OLLAMA_URLS. Servers in OLLAMA_BACKGROUND_URLS take summarize and
+# memory jobs so they never queue behind, or in front of, the user's turn.
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api")
+OLLAMA_URLS = os.environ.get("OLLAMA_URLS", "")
+OLLAMA_BACKGROUND_URLS = os.environ.get("OLLAMA_BACKGROUND_URLS", "")
+HEALTH_INTERVAL = float(os.environ.get("OLLAMA_HEALTH_INTERVAL", 30))  # Seconds between /api/tags checks
+CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", 5))   # Seconds to open a connection
+READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", 300))       # Seconds to wait between bytes
+MAX_RETRIES = int(os.environ.get("OLLAMA_MAX_RETRIES", 2))
+BACKOFF = 0.5        # Base delay in seconds, doubled on each retry
+POOL_SIZE = 10       # Keep-alive connections held open per host
+LATENCY_SAMPLES = 500
+# Request scheduling: each server runs at most MAX_CONCURRENT requests (match OLLAMA_NUM_PARALLEL).
+# On a shared server background requests never take the last slot, only start while no interactive
+# request is running or waiting, and stop deferring after BACKGROUND_MAX_WAIT.
+MAX_CONCURRENT = int(os.environ.get("OLLAMA_MAX_CONCURRENT", 4))
+BACKGROUND_MAX_WAIT = float(os.environ.get("OLLAMA_BACKGROUND_MAX_WAIT", 30))   # Seconds before background work stops yielding
+QUEUE_TIMEOUT = float(os.environ.get("OLLAMA_QUEUE_TIMEOUT", 120))              # Seconds a request may wait for a slot
+
+INTERACTIVE = "interactive"   # The user is waiting on this request
+BACKGROUND = "background"     # Summaries, memory refinement and other work nobody is waiting on
+
+
+class OllamaClient:
+    """Pooled keep-alive HTTP client for the Ollama API with timeouts, retries and latency metrics."""
+
+    def __init__(self, base_url=OLLAMA_URL, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 retries=MAX_RETRIES, backoff=BACKOFF, pool_size=POOL_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.lock = threading.Lock()
+        self.latencies = {}   # endpoint -> recent call durations in seconds
+        self.errors = {}      # endpoint -> failed attempts
+
+    def request(self, method, endpoint, stream=False, timeout=None, **kwargs):
+        """Sends a request, retrying connection errors, timeouts and 5xx replies with jittered backoff.
+
+        For streamed requests the recorded latency is the time until the response headers arrive.
+        """
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, stream=stream, timeout=timeout or self.timeout, **kwargs)
+                if response.status_code >= 500:
+                    response.raise_for_status()
+                self._record(endpoint, time.perf_counter() - start)
+                response.raise_for_status()
+                return response
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            except requests.exceptions.HTTPError as e:
+                if e.response is None or e.response.status_code < 500:
+                    raise
+                error = e
+
+            with self.lock:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            if attempt == self.retries:
+                raise error
+            delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"Ollama {endpoint} failed ({error}). Retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+    def post(self, endpoint, json=None, **kwargs):
+        """POSTs JSON to an Ollama endpoint such as 'generate'."""
+        return self.request("POST", endpoint, json=json, **kwargs)
+
+    def get(self, endpoint, **kwargs):
+        """GETs an Ollama endpoint such as 'tags'."""
+        return self.request("GET", endpoint, **kwargs)
+
+    def _record(self, endpoint, seconds):
+        with self.lock:
+            self.latencies.setdefault(endpoint, deque(maxlen=LATENCY_SAMPLES)).append(seconds)
+
+    def stats(self):
+        """Returns per-endpoint call counts, error counts and latency figures in milliseconds."""
+        with self.lock:
+            result = {}
+            for endpoint in set(self.latencies) | set(self.errors):
+                samples = sorted(self.latencies.get(endpoint, ()))
+                entry = {"calls": len(samples), "errors": self.errors.get(endpoint, 0)}
+                if samples:
+                    entry["avg_ms"] = round(1000 * sum(samples) / len(samples), 1)
+                    entry["p50_ms"] = round(1000 * samples[len(samples) // 2], 1)
+                    entry["max_ms"] = round(1000 * samples[-1], 1)
+                result[endpoint] = entry
+            return result
+
+    def print_stats(self):
+        """Prints a short latency report for every endpoint used."""
+        for endpoint, entry in sorted(self.stats().items()):
+            print(f"Ollama /{endpoint}: " + ", ".join(f"{key}={value}" for key, value in entry.items()))
+
+    def close(self):
+        self.session.close()
+
+
+class Backend:
+    """One Ollama server in a BackendPool: its client, health, models and work in flight."""
+
+    def __init__(self, base_url, role=None, **client_kwargs):
+        self.client = OllamaClient(base_url, retries=0, **client_kwargs)
+        self.base_url = self.client.base_url
+        self.role = role              # INTERACTIVE, BACKGROUND or None for either
+        self.healthy = True           # Assumed until a check or a request says otherwise
+        self.models = None            # Model names from /api/tags, None until checked
+        self.outstanding = 0
+        self.background = 0           # Of the outstanding requests, how many are background work
+        self.checked_at = 0.0
+
+    def check(self, timeout=CONNECT_TIMEOUT):
+        """Refreshes health and the model list from /api/tags."""
+        try:
+            response = self.client.session.get(f"{self.base_url}/tags", timeout=timeout)
+            response.raise_for_status()
+            self.models = {model["name"] for model in response.json().get("models", [])}
+            self.healthy = True
+        except (requests.exceptions.RequestException, ValueError):
+            self.healthy = False
+        self.checked_at = time.monotonic()
+        return self.healthy
+
+    def has_model(self, model):
+        return self.models is None or model in self.models or f"{model}:latest" in self.models
+
+    def __repr__(self):
+        state = "up" if self.healthy else "down"
+        return f"<Backend {self.base_url} {self.role or 'any'} {state} outstanding={self.outstanding}>"
+
+
+class BackendPool:
+    """Spreads Ollama requests over several servers.
+
+    Requests go to a healthy server that has the requested model, preferring servers set aside
+    for the request's role (interactive or background) and then the one with the fewest requests
+    in flight. A server that fails is marked down and the request moves to the next one; every
+    server is re-checked through /api/tags every health_interval seconds.
+
+    The role is also the request's priority. Each server takes at most max_concurrent requests
+    and the rest wait for a slot. Interactive requests take any free slot. On a server that serves
+    both, background requests use at most max_concurrent - 1 slots, so one is always free for the
+    user's turn however long the summaries run, and they wait while an interactive request is
+    running or queued, so a long summary never starts ahead of it. Parallel summaries still run
+    side by side in the other slots. A background request that has waited background_max_wait
+    seconds stops yielding to interactive work so it cannot starve, but still leaves the last
+    slot free.
+
+    Offers the same post/get/stats interface as OllamaClient, plus a role keyword.
+    """
+
+    def __init__(self, urls, background_urls=(), retries=MAX_RETRIES, backoff=BACKOFF,
+                 health_interval=HEALTH_INTERVAL, max_concurrent=MAX_CONCURRENT,
+                 background_max_wait=BACKGROUND_MAX_WAIT,
+                 queue_timeout=QUEUE_TIMEOUT, **client_kwargs):
+        role = INTERACTIVE if background_urls else None
+        self.backends = [Backend(url, role, **client_kwargs) for url in urls]
+        self.backends += [Backend(url, BACKGROUND, **client_kwargs) for url in background_urls]
+        if not self.backends:
+            raise ValueError("BackendPool needs at least one Ollama URL")
+        self.retries = retries
+        self.backoff = backoff
+        self.health_interval = health_interval
+        self.max_concurrent = max_concurrent
+        self.background_max_wait = background_max_wait
+        self.background_slots = max(1, max_concurrent - 1)   # Per shared server; the rest is kept for interactive work
+        self.queue_timeout = queue_timeout
+        self.lock = threading.Lock()
+        self.slot_freed = threading.Condition(self.lock)
+        self.interactive_waiting = 0
+        self.waits = {INTERACTIVE: deque(maxlen=LATENCY_SAMPLES), BACKGROUND: deque(maxlen=LATENCY_SAMPLES)}
+        self.deferred = 0         # Background requests that had to wait for interactive work
+        self.failovers = 0
+        self.thread = None
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        urls = [url.strip() for url in (OLLAMA_URLS or OLLAMA_URL).split(",") if url.strip()]
+        background = [url.strip() for url in OLLAMA_BACKGROUND_URLS.split(",") if url.strip()]
+        return cls(urls, background, **kwargs)
+
+    @property
+    def base_url(self):
+        return self.backends[0].base_url
+
+    def check(self):
+        """Checks every server at once and returns how many are healthy."""
+        threads = [threading.Thread(target=backend.check, daemon=True) for backend in self.backends]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(backend.healthy for backend in self.backends)
+
+    def start_health_checks(self):
+        """Re-checks all servers in a daemon thread every health_interval seconds."""
+        if self.thread is None and len(self.backends) > 1:
+            self.thread = threading.Thread(target=self._health_loop, name="ollama-health", daemon=True)
+            self.thread.start()
+        return self
+
+    def _health_loop(self):
+        while True:
+            self.check()
+            time.sleep(self.health_interval)
+
+    def list_models(self):
+        """Returns the names of the models available on any healthy server."""
+        self.check()
+        models = set()
+        for backend in self.backends:
+            if backend.healthy and backend.models:
+                models |= backend.models
+        return sorted(models)
+
+    def pick(self, model=None, role=INTERACTIVE, exclude=()):
+        """Waits for a slot on the best server for the next request and takes it.
+
+        Returns None if every server was excluded. Raises requests.exceptions.Timeout if no
+        slot came free within queue_timeout seconds.
+        """
+        candidates = [backend for backend in self.backends if backend not in exclude]
+        if not candidates:
+            return None
+
+        def suitable(backend):
+            return (not backend.healthy, bool(model) and not backend.has_model(model))
+
+        def rank(backend):
+            return suitable(backend) + (backend.role not in (role, None), backend.outstanding)
+
+        start = time.perf_counter()
+        waited = False
+        with self.slot_freed:
+            best = min(suitable(backend) for backend in candidates)
+            candidates = [backend for backend in candidates if suitable(backend) == best]
+            if role == INTERACTIVE:
+                self.interactive_waiting += 1
+            try:
+                while True:
+                    elapsed = time.perf_counter() - start
+                    admitted = [backend for backend in candidates if self._admits(backend, role, elapsed)]
+                    if admitted:
+                        break
+                    if not waited and role == BACKGROUND and any(
+                            backend.outstanding < self.max_concurrent for backend in candidates):
+                        self.deferred += 1   # A slot is free, but interactive work goes first
+                    waited = True
+                    if elapsed >= self.queue_timeout:
+                        raise requests.exceptions.Timeout(
+                            f"No free Ollama slot after {elapsed:.0f}s ({role} request)")
+                    # Wake up when a slot frees, or in time for a background request to stop yielding
+                    deadline = self.queue_timeout
+                    if role == BACKGROUND and elapsed < self.background_max_wait:
+                        deadline = min(deadline, self.background_max_wait)
+                    self.slot_freed.wait(deadline - elapsed)
+            finally:
+                if role == INTERACTIVE:
+                    self.interactive_waiting -= 1
+            backend = min(admitted, key=rank)
+            backend.outstanding += 1
+            if role == BACKGROUND:
+                backend.background += 1
+            wait = time.perf_counter() - start
+            self.waits.setdefault(role, deque(maxlen=LATENCY_SAMPLES)).append(wait)
+        if waited:
+            tracing.tracer.add(f"ollama_queue_{role}", start, wait)
+        return backend
+
+    def _admits(self, backend, role, waited):
+        """Whether a request of this role that has waited this many seconds may start on backend now."""
+        if backend.outstanding >= self.max_concurrent:
+            return False
+        if role != BACKGROUND or backend.role == BACKGROUND:
+            return True
+        if backend.background >= self.background_slots:
+            return False
+        if waited >= self.background_max_wait:
+            return True
+        interactive = backend.outstanding - backend.background
+        return not interactive and not self.interactive_waiting
+
+    def _release(self, backend, role=INTERACTIVE):
+        with self.slot_freed:
+            backend.outstanding -= 1
+            if role == BACKGROUND:
+                backend.background -= 1
+            self.slot_freed.notify_all()
+
+    def request(self, method, endpoint, stream=False, timeout=None, role=INTERACTIVE, **kwargs):
+        """Sends a request to the best server, failing over to the others on errors.
+
+        A streamed response counts as outstanding on its server until it is closed.
+        """
+        model = (kwargs.get("json") or {}).get("model")
+        tried = []
+        for attempt in range(self.retries + 1):
+            error = None
+            while True:
+                backend = self.pick(model, role, exclude=tried)
+                if backend is None:
+                    break
+                tried.append(backend)
+                try:
+                    response = backend.client.request(method, endpoint, stream=stream, timeout=timeout, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = e
+                except requests.exceptions.HTTPError as e:
+                    if e.response is None or e.response.status_code < 500:
+                        self._release(backend, role)
+                        raise
+                    error = e
+                except Exception:
+                    self._release(backend, role)
+                    raise
+                else:
+                    backend.healthy = True
+                    if stream:
+                        self._release_on_close(response, backend, role)
+                    else:
+                        self._release(backend, role)
+                    return response
+                backend.healthy = False   # Skipped until a health check or a later request succeeds
+                self._release(backend, role)
+                if len(self.backends) > 1:
+                    with self.lock:
+                        self.failovers += 1
+                    print(f"Ollama server {backend.base_url} failed ({error}). Trying another server...")
+
+            # Every server failed: wait, then give them all another chance
+            if attempt == self.retries:
+                raise error
+            tried = []
+            delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"Ollama {endpoint} failed ({error}). Retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+    def _release_on_close(self, response, backend, role):
+        close = response.close
+        released = []
+
+        def close_and_release():
+            close()
+            if not released:
+                released.append(True)
+                self._release(backend, role)
+        response.close = close_and_release
+
+    def post(self, endpoint, json=None, **kwargs):
+        """POSTs JSON to an Ollama endpoint such as 'generate'. Pass role=BACKGROUND for background work."""
+        return self.request("POST", endpoint, json=json, **kwargs)
+
+    def get(self, endpoint, **kwargs):
+        """GETs an Ollama endpoint such as 'tags'."""
+        return self.request("GET", endpoint, **kwargs)
+
+    def stats(self):
+        """Returns per-endpoint figures, keyed by server when there is more than one."""
+        if len(self.backends) == 1:
+            return self.backends[0].client.stats()
+        result = {}
+        for backend in self.backends:
+            for endpoint, entry in backend.client.stats().items():
+                result[f"{endpoint} @ {backend.base_url}"] = entry
+        return result
+
+    def print_stats(self):
+        for endpoint, entry in sorted(self.stats().items()):
+            print(f"Ollama /{endpoint}: " + ", ".join(f"{key}={value}" for key, value in entry.items()))
+        for role, entry in self.queue_stats().items():
+            print(f"Ollama queue {role}: " + ", ".join(f"{key}={value}" for key, value in entry.items()))
+        if len(self.backends) > 1:
+            print(f"Ollama servers: {self.backends}, failovers={self.failovers}")
+
+    def queue_stats(self):
+        """Returns how long requests of each role waited for a slot."""
+        result = {}
+        with self.lock:
+            for role, waits in self.waits.items():
+                if not waits:
+                    continue
+                ordered = sorted(waits)
+                result[role] = {
+                    "count": len(ordered),
+                    "p50_ms": round(1000 * tracing.percentile(ordered, 0.5), 1),
+                    "p95_ms": round(1000 * tracing.percentile(ordered, 0.95), 1),
+                    "max_ms": round(1000 * ordered[-1], 1),
+                }
+            if BACKGROUND in result:
+                result[BACKGROUND]["deferred"] = self.deferred
+        return result
+
+    def close(self):
+        for backend in self.backends:
+            backend.client.close()
+
+
+# Shared client used by every Ollama call in the project.
+client = BackendPool.from_env().start_health_checks()
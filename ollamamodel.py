@@ -1,8 +1,12 @@
+import os
 import requests
+import ollamaclient
 import threading
 import time
 
 selected_model = None  # Ensure selected_model is declared globally
+SELECT_TIMEOUT = float(os.environ.get("OLLAMA_SELECT_TIMEOUT", 10))  # Seconds before the first model is picked
+DEFAULT_MODEL = os.environ.get("OLLAMA_MODEL")  # Skips the prompt when this model is available
 
 def get_user_selection(models):
     """Handles user input for model selection with timeout."""
@@ -21,14 +25,10 @@ def get_user_selection(models):
     selected_model = models[0]
 
 def get_ollama_model_http():
-    """Fetch available Ollama models via HTTP request and prompt user to select one within 10 seconds."""
+    """Fetch available Ollama models via HTTP request and prompt user to select one within SELECT_TIMEOUT seconds."""
     global selected_model
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)  # Timeout for HTTP request
-        response.raise_for_status()
-
-        data = response.json()
-        models = [model["name"] for model in data.get("models", [])]
+        models = ollamaclient.client.list_models()  # Models on every reachable server
 
         if not models:
             print("No models found in Ollama.")
@@ -36,16 +36,21 @@ def get_ollama_model_http():
             
             return
 
+        if DEFAULT_MODEL in models or len(models) == 1:
+            selected_model = DEFAULT_MODEL if DEFAULT_MODEL in models else models[0]
+            print(f"Selected Model: {selected_model}")
+            return selected_model
+
         print("Available Ollama Models:")
         for index, model in enumerate(models, start=1):
             print(f"{index}. {model}")
 
-        # Start a thread for user input
-        input_thread = threading.Thread(target=get_user_selection, args=(models,))
+        # Start a thread for user input; it is a daemon so an unanswered prompt can't keep the program alive
+        input_thread = threading.Thread(target=get_user_selection, args=(models,), daemon=True)
         input_thread.start()
 
-        # Wait for input or timeout after 10 seconds
-        input_thread.join(timeout=None)
+        # Wait for input or timeout after SELECT_TIMEOUT seconds
+        input_thread.join(timeout=SELECT_TIMEOUT)
 
         if not selected_model:
             print(f"Timed out! Defaulting to: {models[0]}")
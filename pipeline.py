@@ -0,0 +1,144 @@
+import queue
+import threading
+import time
+
+import tracing
+
+STOP = object()   # Sentinel that shuts a stage worker down
+
+
+class Cancelled(Exception):
+    """Raised inside a stage to abandon a job that was cancelled, e.g. when the user barges in."""
+
+
+class Job:
+    """One turn moving through the pipeline. Stages read and write its fields like a dict."""
+
+    def __init__(self, **data):
+        self.data = data
+        self.cancelled = threading.Event()
+        self.error = None
+        self.timings = {}      # stage name -> seconds spent in that stage
+        self.created = time.perf_counter()
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def check(self):
+        """Raises Cancelled if the job has been cancelled; call it between slow steps."""
+        if self.cancelled.is_set():
+            raise Cancelled()
+
+
+class Stage:
+    """A named step of the pipeline.
+
+    func(job) does the work. Returning False drops the job (later stages never see it).
+    Stages with always=True still run for cancelled jobs and for jobs an earlier stage failed on
+    (job.error is set), e.g. saving history; the other stages skip them.
+    maxsize bounds the stage's input queue, so a slow stage pushes back on the ones before it.
+    """
+
+    def __init__(self, name, func, workers=1, maxsize=2, always=False):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.maxsize = maxsize
+        self.always = always
+
+
+class Pipeline:
+    """Runs jobs through a chain of stages, each on its own worker threads, so turns overlap."""
+
+    def __init__(self, stages, on_cancel=None):
+        self.stages = stages
+        self.on_cancel = on_cancel
+        self.queues = [queue.Queue(maxsize=stage.maxsize) for stage in stages]
+        self.threads = []
+        self.live = set()
+        self.condition = threading.Condition()
+
+    def start(self):
+        for index, stage in enumerate(self.stages):
+            for worker in range(stage.workers):
+                thread = threading.Thread(target=self._run, args=(index,), name=f"{stage.name}-{worker}", daemon=True)
+                thread.start()
+                self.threads.append((index, thread))
+        return self
+
+    def submit(self, job, block=True, timeout=None):
+        """Queues a job at the first stage. Blocks while that stage is full unless block is False."""
+        with self.condition:
+            self.live.add(job)
+        try:
+            self.queues[0].put(job, block=block, timeout=timeout)
+        except queue.Full:
+            self._finish(job)
+            raise
+        return job
+
+    def cancel(self):
+        """Cancels every job still in flight. Stages marked always still see them."""
+        with self.condition:
+            jobs = list(self.live)
+        for job in jobs:
+            job.cancelled.set()
+        if jobs and self.on_cancel:
+            self.on_cancel()
+        return len(jobs)
+
+    @property
+    def busy(self):
+        with self.condition:
+            return bool(self.live)
+
+    def wait(self, timeout=None):
+        """Waits until every submitted job has left the pipeline. Returns False on timeout."""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.live, timeout)
+
+    def stop(self, timeout=None):
+        """Lets queued jobs drain, then shuts the workers down stage by stage."""
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                self.queues[index].put(STOP)
+            for thread_index, thread in self.threads:
+                if thread_index == index:
+                    thread.join(timeout)
+
+    def _finish(self, job):
+        with self.condition:
+            self.live.discard(job)
+            self.condition.notify_all()
+
+    def _run(self, index):
+        stage = self.stages[index]
+        inbox = self.queues[index]
+        while True:
+            job = inbox.get()
+            if job is STOP:
+                return
+
+            keep = True
+            if stage.always or not (job.cancelled.is_set() or job.error is not None):
+                start = time.perf_counter()
+                try:
+                    with tracing.span(stage.name, turn=job.get("turn")):
+                        keep = stage.func(job) is not False
+                except Cancelled:
+                    pass
+                except Exception as e:
+                    job.error = e
+                    print(f"Error in {stage.name} stage: {e}")
+                job.timings[stage.name] = time.perf_counter() - start
+
+            if keep and index + 1 < len(self.queues):
+                self.queues[index + 1].put(job)
+            else:
+                self._finish(job)
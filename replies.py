@@ -0,0 +1,54 @@
+import json
+import re
+import time
+
+import ollamaclient
+import sentences
+import tracing
+
+OLLAMA_ERROR = "I'm having trouble connecting to Ollama."
+NO_RESPONSE = "I have no response at the moment."
+CODE_BLOCK = re.compile(r'```([\s\S]*?)```')
+
+
+def strip_code(text):
+    """The reply without its ``` blocks, as it is kept in history and spoken."""
+    return CODE_BLOCK.sub('', text)
+
+
+def stream(endpoint, data, on_sentence=None, role=ollamaclient.INTERACTIVE, on_done=None):
+    """Posts a generate or chat request with streaming on and returns the fully assembled reply.
+
+    Each finished sentence outside code blocks is passed to on_sentence as soon as it is complete,
+    and Ollama's final chunk (with its timings) to on_done. Request errors are raised. The response
+    is always closed, which also stops generation early if on_sentence gave up on the reply.
+    """
+    start = time.perf_counter()
+    response = ollamaclient.client.post(endpoint, json=dict(data, stream=True), stream=True, role=role)
+
+    splitter = sentences.SentenceSplitter()
+    pieces = []
+    try:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            token = chunk.get("response") or chunk.get("message", {}).get("content", "")
+            if token and not any(pieces):
+                tracing.tracer.add("ollama_first_token", start, time.perf_counter() - start, endpoint=endpoint)
+            pieces.append(token)
+            if on_sentence:
+                for sentence in splitter.feed(token):
+                    on_sentence(sentence)
+            if chunk.get("done"):
+                tracing.tracer.record_ollama(chunk)
+                if on_done:
+                    on_done(chunk)
+                break
+        if on_sentence:
+            for sentence in splitter.flush():
+                on_sentence(sentence)
+    finally:
+        response.close()
+
+    return "".join(pieces) or NO_RESPONSE
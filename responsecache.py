@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_FILE = "response_cache.sqlite3"
+MEMORY_ENTRIES = 256                                                # Entries kept in the in-memory LRU tier
+DEFAULT_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 7 * 24 * 3600))  # Seconds an entry stays valid
+
+
+def cache_key(request):
+    """Content address of a request: hash of model, options and prompt/messages."""
+    payload = {key: value for key, value in request.items() if key not in ("stream", "keep_alive")}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier cache of Ollama replies: an LRU dict in memory in front of a SQLite table on disk."""
+
+    def __init__(self, path=CACHE_FILE, memory_entries=MEMORY_ENTRIES, ttl=DEFAULT_TTL):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.memory = OrderedDict()     # key -> (expires_at, text)
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        self.db = None
+        try:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires_at REAL, text TEXT)")
+            self.db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self.db.commit()
+        except sqlite3.Error as e:
+            print(f"Response cache on disk unavailable, using memory only: {e}")
+            self.db = None
+
+    def get(self, key):
+        """Returns the cached text for key, or None if it is missing or expired."""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and entry[0] >= now:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[1]
+            if entry:
+                del self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute("SELECT expires_at, text FROM responses WHERE key = ?", (key,)).fetchone()
+                if row and row[0] >= now:
+                    self._remember(key, row[0], row[1])
+                    self.stats["disk_hits"] += 1
+                    return row[1]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, text, ttl=None):
+        """Stores text under key in both tiers."""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self._remember(key, expires_at, text)
+            self.stats["stores"] += 1
+            if self.db is not None:
+                try:
+                    self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, expires_at, text))
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    print(f"Could not write response cache: {e}")
+
+    def _remember(self, key, expires_at, text):
+        self.memory[key] = (expires_at, text)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def print_stats(self):
+        print(f"Response cache: {self.stats}, hit rate {self.hit_rate():.0%}")
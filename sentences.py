@@ -0,0 +1,50 @@
+import re
+
+
+class SentenceSplitter:
+    """Collects streamed tokens and hands back finished sentences, skipping ``` code blocks."""
+
+    SENTENCE_END = re.compile(r'(.*?[.!?:])(\s+)', flags=re.DOTALL)
+
+    def __init__(self):
+        self.buffer = ""
+        self.in_code = False
+
+    def feed(self, token):
+        """Adds a token and returns the list of sentences it completed."""
+        self.buffer += token
+        sentences = []
+        while True:
+            if self.in_code:
+                end = self.buffer.find("```")
+                if end == -1:
+                    # Keep a couple of characters in case the fence is split across tokens
+                    self.buffer = self.buffer[-2:]
+                    return sentences
+                self.buffer = self.buffer[end + 3:]
+                self.in_code = False
+                continue
+
+            fence = self.buffer.find("```")
+            text = self.buffer if fence == -1 else self.buffer[:fence]
+            match = self.SENTENCE_END.match(text)
+            if match:
+                sentence = match.group(1).strip()
+                if sentence:
+                    sentences.append(sentence)
+                self.buffer = self.buffer[match.end():]
+                continue
+            if fence != -1:
+                if text.strip():
+                    sentences.append(text.strip())
+                self.buffer = self.buffer[fence + 3:]
+                self.in_code = True
+                continue
+            return sentences
+
+    def flush(self):
+        """Returns whatever text is left once the stream has finished."""
+        rest = "" if self.in_code else self.buffer.strip()
+        self.buffer = ""
+        self.in_code = False
+        return [rest] if rest else []
@@ -0,0 +1,311 @@
+# Multi-session server: many clients talk to the assistant at once over plain TCP.
+# Each line is one JSON message. A client starts with {"type": "hello", "session": "<id>"}
+# (omit the id to get a new one), then sends turns as {"type": "text", "text": "...", "id": 1}
+# or {"type": "audio", "pcm": "<base64 16-bit mono>", "rate": 16000, "id": 2}. The server answers
+# with "transcript" (audio turns), one "sentence" per finished sentence and a final "reply",
+# all carrying the turn's id. Sessions keep their own history and memory under SESSIONS_DIR.
+# Usage: python server.py [--host 127.0.0.1] [--port 8765] [--model llama3]
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import ollamaclient
+import ollamamodel
+import session
+import tracing
+
+HOST = os.environ.get("SERVER_HOST", "127.0.0.1")
+PORT = int(os.environ.get("SERVER_PORT", 8765))
+MAX_CONCURRENT = int(os.environ.get("SERVER_MAX_CONCURRENT", 4))   # Turns in flight across all sessions
+MAX_PENDING = int(os.environ.get("SERVER_MAX_PENDING", 4))         # Turns one session may queue before new ones are refused
+MAX_LINE = 16 * 1024 * 1024    # Longest message accepted; audio turns arrive base64 encoded
+DEFAULT_RATE = 16000
+
+
+class SessionBusy(Exception):
+    """The session already has MAX_PENDING turns waiting."""
+
+
+class FairScheduler:
+    """Runs session turns on worker threads, at most max_concurrent at once, serving sessions in turn.
+
+    Every session has its own queue and at most one turn running, so a client that sends many
+    turns never holds more than one slot. Sessions with work waiting are served round-robin:
+    when a turn finishes, its session goes to the back of the line. The turns that do run
+    reach Ollama together, where its parallel slots (OLLAMA_NUM_PARALLEL) batch them.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT, max_pending=MAX_PENDING):
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.queues = {}          # session id -> deque of (func, args, future, queued at)
+        self.ready = deque()      # Sessions with work waiting and nothing running, in serving order
+        self.running = set()
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="turn")
+        self.waits = deque(maxlen=tracing.MAX_SAMPLES)   # Seconds turns spent queued
+        self.served = {}          # session id -> turns run
+
+    def submit(self, session_id, func, *args):
+        """Queues func(*args) for a session and returns a future for its result.
+
+        Raises SessionBusy when the session already has max_pending turns waiting.
+        """
+        queue = self.queues.setdefault(session_id, deque())
+        if len(queue) >= self.max_pending:
+            raise SessionBusy(f"{len(queue)} turns are already waiting")
+        future = asyncio.get_running_loop().create_future()
+        queue.append((func, args, future, time.perf_counter()))
+        if session_id not in self.running and session_id not in self.ready:
+            self.ready.append(session_id)
+        self._dispatch()
+        return future
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self.ready and len(self.running) < self.max_concurrent:
+            session_id = self.ready.popleft()
+            func, args, future, queued = self.queues[session_id].popleft()
+            if future.cancelled():   # The client went away while the turn waited
+                self._requeue(session_id)
+                continue
+            wait = time.perf_counter() - queued
+            self.waits.append(wait)
+            tracing.tracer.add("queue_wait", queued, wait, turn=session_id)
+            self.running.add(session_id)
+            self.served[session_id] = self.served.get(session_id, 0) + 1
+            work = loop.run_in_executor(self.executor, func, *args)
+            work.add_done_callback(partial(self._finished, session_id, future))
+
+    def _requeue(self, session_id):
+        if self.queues.get(session_id):
+            self.ready.append(session_id)
+        else:
+            self.queues.pop(session_id, None)
+
+    def _finished(self, session_id, future, work):
+        self.running.discard(session_id)
+        if not future.cancelled():
+            if work.exception() is not None:
+                future.set_exception(work.exception())
+            else:
+                future.set_result(work.result())
+        self._requeue(session_id)
+        self._dispatch()
+
+    def busy(self, session_id):
+        """True while the session has a turn running or waiting."""
+        return session_id in self.running or bool(self.queues.get(session_id))
+
+    def stats(self):
+        waits = sorted(self.waits)
+        served = sorted(self.served.values())
+        return {
+            "turns": sum(served),
+            "sessions": len(served),
+            "queue_p50_ms": round(1000 * tracing.percentile(waits, 0.5), 1),
+            "queue_p95_ms": round(1000 * tracing.percentile(waits, 0.95), 1),
+            "fewest_turns": served[0] if served else 0,
+            "most_turns": served[-1] if served else 0,
+        }
+
+    def print_stats(self):
+        print(f"Scheduler: {self.stats()}")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+def run_turn(client_session, text, pcm, rate, emit):
+    """Worker-thread body of one turn: transcribes audio if there is any, then asks the model."""
+    if pcm is not None:
+        text = session.transcribe(pcm, rate)
+        emit({"type": "transcript", "text": text})
+        if not text:
+            return ""
+    return client_session.respond(text, on_sentence=lambda sentence: emit({"type": "sentence", "text": sentence}))
+
+
+class Server:
+    """Accepts client connections and feeds their turns to one shared FairScheduler."""
+
+    def __init__(self, model, scheduler=None, sessions_dir=session.SESSIONS_DIR):
+        self.model = model
+        self.scheduler = scheduler or FairScheduler()
+        self.sessions_dir = sessions_dir
+        self.sessions = {}        # session id -> [Session, open connections]
+
+    def open_session(self, session_id, model=None):
+        self._prune()
+        if not session.valid_id(session_id):
+            session_id = uuid.uuid4().hex
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            entry = self.sessions[session_id] = [
+                session.Session(session_id, model or self.model, self.sessions_dir), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def close_session(self, client_session):
+        entry = self.sessions.get(client_session.id)
+        if entry is None:
+            return
+        entry[1] -= 1
+        self._prune()
+
+    def _prune(self):
+        """Forgets sessions nobody is connected to once their last turn is done; it is all on disk."""
+        for session_id, (_, connections) in list(self.sessions.items()):
+            if connections <= 0 and not self.scheduler.busy(session_id):
+                del self.sessions[session_id]
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        outbox = asyncio.Queue()
+        sender = asyncio.create_task(self._send_loop(outbox, writer))
+        client_session = None
+        turns = set()
+
+        def send(message):
+            outbox.put_nowait(message)
+
+        def emit(message):
+            try:
+                loop.call_soon_threadsafe(outbox.put_nowait, message)   # From a worker thread
+            except RuntimeError:
+                pass   # The server stopped while the turn was running; it is still saved
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break   # Message over MAX_LINE or the connection dropped
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    kind = message.get("type")
+                except (ValueError, AttributeError):
+                    send({"type": "error", "message": "expected one JSON object per line"})
+                    continue
+                if kind == "hello" and client_session is None:
+                    client_session = self.open_session(message.get("session"), message.get("model"))
+                    send({"type": "ready", "session": client_session.id, "model": client_session.model})
+                elif kind in ("text", "audio"):
+                    if client_session is None:
+                        client_session = self.open_session(None)
+                        send({"type": "ready", "session": client_session.id, "model": client_session.model})
+                    task = asyncio.create_task(self.turn(client_session, message, send, emit))
+                    turns.add(task)
+                    task.add_done_callback(turns.discard)
+                elif kind == "bye":
+                    break
+                else:
+                    send({"type": "error", "message": f"unknown message type {kind!r}"})
+        finally:
+            for task in list(turns):
+                task.cancel()   # Waiting turns are dropped; a running one finishes and is saved
+            if client_session is not None:
+                self.close_session(client_session)
+            outbox.put_nowait(None)
+            await sender
+
+    async def turn(self, client_session, message, send, emit):
+        turn_id = message.get("id")
+
+        def tagged(reply):
+            reply["id"] = turn_id
+            emit(reply)
+
+        start = time.perf_counter()
+        text, pcm = message.get("text", ""), None
+        try:
+            if message["type"] == "audio":
+                pcm = base64.b64decode(message.get("pcm", ""), validate=True)
+            elif not isinstance(text, str) or not text.strip():
+                raise ValueError("empty text turn")
+            rate = int(message.get("rate", DEFAULT_RATE))
+            future = self.scheduler.submit(client_session.id, run_turn, client_session, text, pcm, rate, tagged)
+        except (binascii.Error, ValueError, TypeError, SessionBusy) as e:
+            send({"type": "error", "id": turn_id, "message": str(e)})
+            return
+        try:
+            reply = await future
+        except Exception as e:
+            print(f"[{client_session.id}] Turn failed: {e!r}")
+            send({"type": "error", "id": turn_id, "message": str(e)})
+            return
+        send({"type": "reply", "id": turn_id, "text": reply, "ms": round(1000 * (time.perf_counter() - start), 1)})
+
+    async def _send_loop(self, outbox, writer):
+        try:
+            while True:
+                message = await outbox.get()
+                if message is None:
+                    break
+                writer.write((json.dumps(message) + "\n").encode("utf-8"))
+                await writer.drain()
+        except ConnectionError:
+            pass   # The client is gone; its turns are still saved
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT, started=None):
+        """Serves until cancelled. started, if given, is set to the bound (host, port) once listening."""
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+        address = server.sockets[0].getsockname()[:2]
+        print(f"Serving {self.model} on {address[0]}:{address[1]} "
+              f"({self.scheduler.max_concurrent} turns at a time)")
+        if started is not None:
+            started(address)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.scheduler.shutdown()
+        for client_session, _ in self.sessions.values():
+            client_session.save()
+
+
+def pick_model(requested=None):
+    """The model to serve: the one asked for, OLLAMA_MODEL, or the first one Ollama has."""
+    if requested or ollamamodel.DEFAULT_MODEL:
+        return requested or ollamamodel.DEFAULT_MODEL
+    models = ollamaclient.client.list_models()
+    if not models:
+        raise SystemExit("No Ollama models available; pull one or pass --model.")
+    return models[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the assistant to many clients at once.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--model", help="model for new sessions (default: OLLAMA_MODEL or the first one installed)")
+    parser.add_argument("--max-concurrent", type=int, default=MAX_CONCURRENT, help="turns in flight at once")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help="turns one session may queue")
+    args = parser.parse_args()
+
+    server = Server(pick_model(args.model), FairScheduler(args.max_concurrent, args.max_pending))
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        server.close()
+        server.scheduler.print_stats()
+        ollamaclient.client.print_stats()
+        tracing.tracer.print_summary()
+        tracing.tracer.close()
+
+
+if __name__ == "__main__":
+    main()
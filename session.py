@@ -0,0 +1,159 @@
+import os
+import re
+import threading
+
+import requests
+
+import contextbuilder
+import historystore
+import memoryindex
+import memoryrefiner
+import ollamaclient
+import prompts
+import replies
+import tracing
+import turns
+
+SESSIONS_DIR = os.environ.get("SESSIONS_DIR", "sessions")   # One folder of history and memory per session
+SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def valid_id(session_id):
+    return isinstance(session_id, str) and SESSION_ID.match(session_id) is not None
+
+
+class Session:
+    """One client's conversation: its own history, memory file, memory index and context builder.
+
+    Everything on disk lives under SESSIONS_DIR/<id>, so a client that reconnects with the same
+    id picks up where it left off. Requests go through the shared ollamaclient pool. A session
+    runs one turn at a time; the server's scheduler makes sure of that, so nothing here locks.
+    Summaries and memory refinement run after the turn on short-lived background threads; the
+    refiner writes the session's memory.txt once a full batch of turns is waiting, as in the
+    voice assistant.
+    """
+
+    def __init__(self, session_id, model, root=SESSIONS_DIR):
+        self.id = session_id
+        self.model = model
+        self.path = os.path.join(root, session_id)
+        os.makedirs(self.path, exist_ok=True)
+        self.history_store = historystore.HistoryStore(os.path.join(self.path, historystore.HISTORY_FILE))
+        self.history = turns.TurnLog(self.history_store)
+        self.memory_path = os.path.join(self.path, "memory.txt")
+        self.memory_cache = {"mtime": None, "text": "", "indexed_mtime": None}
+        self.memory_index = memoryindex.MemoryIndex(os.path.join(self.path, memoryindex.INDEX_PATH))
+        self.context_builder = contextbuilder.ContextBuilder(self.summarize)
+        self.memory_refiner = memoryrefiner.MemoryRefiner(self.history_store, self.summarize, self.memory_path)
+        self.refine_thread = None
+        self.turns = 0
+
+    def load_memory(self):
+        """Returns the session's memory file, only reading it again when it has changed on disk."""
+        try:
+            mtime = os.path.getmtime(self.memory_path)
+        except OSError:
+            return ""
+        cache = self.memory_cache
+        if cache["mtime"] != mtime:
+            with open(self.memory_path, "r", encoding="utf-8") as f:
+                cache["text"] = f.read()
+            cache["mtime"] = mtime
+        if cache["indexed_mtime"] != mtime and self.memory_index.enabled:
+            try:
+                self.memory_index.sync(self.memory_path, cache["text"])
+                self.memory_index.save()
+                cache["indexed_mtime"] = mtime
+            except requests.exceptions.RequestException as e:
+                print(f"[{self.id}] Could not index {self.memory_path}: {e}")
+        return cache["text"]
+
+    def summarize(self, prompt):
+        """Summarizer for the context builder and memory refiner; returns None on failure. It runs after the turn."""
+        data = {"model": self.model, "prompt": prompt, "stream": False,
+                "options": {"num_ctx": prompts.NUM_CTX}}
+        try:
+            response = ollamaclient.client.post("generate", json=data, role=ollamaclient.BACKGROUND)
+            return response.json().get("response")
+        except requests.exceptions.RequestException as e:
+            print(f"[{self.id}] Summary failed: {e}")
+            return None
+
+    def build_context(self, prompt):
+        """Returns (history_text, memory_text) for a prompt, like the voice assistant's build_context()."""
+        current_memory = self.load_memory()
+        relevant = memoryindex.safe_search(self.memory_index, prompt)
+        if relevant is not None:
+            current_memory = memoryindex.format_results(relevant)
+        return self.context_builder.build(
+            self.history, current_memory, reserved=contextbuilder.estimate_tokens(prompt))
+
+    def respond(self, text, on_sentence=None):
+        """Runs one turn and returns the reply. Sentences are passed to on_sentence as they stream in.
+
+        Commands in the reply are not run: on a shared server they are left to the client.
+        """
+        self.turns += 1
+        turn = f"{self.id}:{self.turns}"
+        with tracing.span("turn", turn=turn):
+            with tracing.span("prompt_build"):
+                context = self.build_context(text)
+            self.history.append(turns.Turn("user", text))
+            reply = self.generate(prompts.build_user_prompt(text, context), on_sentence)
+            self.history.append(turns.Turn("assistant", replies.strip_code(reply)))
+            self.save()
+        self.context_builder.fold_in_background(self.history)
+        self.refine_memory()
+        return reply
+
+    def generate(self, user_prompt, on_sentence=None):
+        endpoint, data = prompts.build_request(self.model, user_prompt)
+        try:
+            return replies.stream(endpoint, data, on_sentence)
+        except requests.exceptions.RequestException as e:
+            print(f"[{self.id}] Error communicating with Ollama: {e}")
+            return replies.OLLAMA_ERROR
+
+    def refine_memory(self):
+        """Starts a memory refinement pass on a daemon thread if a full batch of turns is waiting."""
+        waiting = len(self.history_store) - self.history_store.get_mark(memoryrefiner.MARK)
+        if waiting < self.memory_refiner.batch_size or (self.refine_thread and self.refine_thread.is_alive()):
+            return None
+        self.refine_thread = threading.Thread(target=self._refine, name=f"refine-{self.id}", daemon=True)
+        self.refine_thread.start()
+        return self.refine_thread
+
+    def _refine(self):
+        try:
+            self.memory_refiner.run_once(max_batches=1)
+        except Exception as e:
+            print(f"[{self.id}] Error refining memory: {e}")
+
+    def save(self):
+        """Writes new turns to the session's history store and memory index."""
+        for turn in self.history.save():
+            try:
+                self.memory_index.add("history", turn.render())
+            except requests.exceptions.RequestException as e:
+                print(f"[{self.id}] Could not index conversation turn: {e}")
+        self.memory_index.save()
+
+
+stt = None
+stt_lock = threading.Lock()   # Speech backends keep per-utterance state, so transcriptions take turns
+
+
+def transcribe(pcm, rate):
+    """Transcribes 16-bit mono PCM with the configured speech backend; returns "" if nothing was understood."""
+    global stt
+    import speech_recognition as sr   # Only needed once a client sends audio
+    import sttbackend
+    with stt_lock:
+        if stt is None:
+            stt = sttbackend.get_backend()
+        try:
+            with tracing.span("transcribe", bytes=len(pcm)):
+                return stt.transcribe(sr.AudioData(pcm, rate, sttbackend.SAMPLE_WIDTH))
+        except (sr.UnknownValueError, sr.RequestError) as e:
+            print(f"Could not transcribe audio: {e!r}")
+            return ""
@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+
+import intents
+import tracing
+
+STABLE_SECONDS = float(os.environ.get("SPECULATE_STABLE_SECONDS", 0.4))   # Partial unchanged this long counts as stable
+MIN_WORDS = 3            # Shorter partials are not worth speculating on
+MIN_COVERAGE = 0.75      # Share of the final words a speculation must already have seen to be reused
+COMMIT_WAIT = 5.0        # Seconds commit() waits for a matching speculation that is still being built
+
+
+class Speculation:
+    """Work started for one partial transcript."""
+
+    def __init__(self, text, version):
+        self.text = text
+        self.words = intents.normalize(text).split()
+        self.version = version        # History version the context was built against
+        self.context = None
+        self.response = None          # Open prefill response, closed to cancel it
+        self.done = threading.Event()
+
+
+class Speculator:
+    """Prepares the next LLM request while the user is still talking.
+
+    Partial transcripts that stay unchanged for stable_seconds are handed to build(text),
+    which assembles the prompt context (retrieval plus history), and then to prefill(context,
+    text), which sends it to Ollama so the model's prompt cache is warm. When the final
+    transcript arrives, commit() returns the context if the speculation still matches it,
+    or cancels the prefill and returns None so the turn is built the normal way.
+    """
+
+    def __init__(self, build, prefill, version=None, stable_seconds=STABLE_SECONDS, min_words=MIN_WORDS):
+        self.build = build
+        self.prefill = prefill
+        self.version = version or (lambda: 0)   # Changes whenever the history the context uses changes
+        self.stable_seconds = stable_seconds
+        self.min_words = min_words
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.latest = None
+        self.changed_at = 0.0
+        self.current = None
+        self.turn = None
+        self.stats = {"speculated": 0, "hits": 0, "misses": 0, "unused": 0}
+        self.thread = None
+
+    def begin(self):
+        """Starts listening for partials of a new utterance."""
+        with self.lock:
+            self.latest = None
+            self.current = None
+            self.turn = tracing.current_turn()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._loop, name="speculate", daemon=True)
+            self.thread.start()
+
+    def on_partial(self, text):
+        """Callback for talkmod's on_partial hook."""
+        with self.lock:
+            self.latest = text
+            self.changed_at = time.perf_counter()
+        self.wake.set()
+
+    def _loop(self):
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            while True:
+                with self.lock:
+                    text = self.latest
+                    quiet = time.perf_counter() - self.changed_at
+                    current = self.current
+                if text is None or len(text.split()) < self.min_words:
+                    break
+                if current is not None and current.text == text:
+                    break   # Already speculated on exactly this
+                if quiet < self.stable_seconds:
+                    time.sleep(self.stable_seconds - quiet)
+                    continue
+                self._speculate(text)
+                break
+
+    def _speculate(self, text):
+        speculation = Speculation(text, self.version())
+        with self.lock:
+            if self.latest != text:
+                return
+            previous, self.current = self.current, speculation
+            self.stats["speculated"] += 1
+        if previous is not None:
+            _close(previous)
+        tracing.set_turn(self.turn)
+        try:
+            with tracing.span("speculate", words=len(speculation.words)):
+                speculation.context = self.build(text)
+                speculation.done.set()   # The context is usable even if the prefill is still running
+                with self.lock:
+                    if self.current is not speculation:
+                        return
+                speculation.response = self.prefill(speculation.context, text)
+                if speculation.response is not None:
+                    for _ in speculation.response.iter_lines():
+                        pass   # Read the (one token) reply so Ollama finishes the prefill
+        except Exception as e:
+            with self.lock:
+                cancelled = self.current is not speculation
+            if not cancelled:
+                print(f"Speculative prefill failed: {e}")
+        finally:
+            speculation.done.set()
+            _close(speculation)
+
+    def matches(self, speculation, final_words):
+        seen = speculation.words
+        if not seen or final_words[:len(seen)] != seen:
+            return False
+        return len(seen) >= MIN_COVERAGE * len(final_words)
+
+    def commit(self, final_text):
+        """Returns the speculative context for final_text, or None (cancelling the prefill) on a miss."""
+        with self.lock:
+            speculation, self.current, self.latest = self.current, None, None
+        if speculation is None:
+            return None
+        final_words = intents.normalize(final_text or "").split()
+        if self.matches(speculation, final_words):
+            speculation.done.wait(COMMIT_WAIT)
+            if speculation.context is not None and speculation.version == self.version():
+                self.stats["hits"] += 1
+                return speculation.context
+        self.stats["misses"] += 1
+        _close(speculation)
+        return None
+
+    def cancel(self):
+        """Drops any speculation, e.g. when the utterance turned out to be a local command."""
+        with self.lock:
+            speculation, self.current, self.latest = self.current, None, None
+        if speculation is not None:
+            self.stats["unused"] += 1
+            _close(speculation)
+
+    def hit_rate(self):
+        decided = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / decided if decided else 0.0
+
+    def print_stats(self):
+        print(f"Speculation: {self.stats}, hit rate {self.hit_rate():.0%}")
+
+
+def _close(speculation):
+    response = speculation.response
+    if response is not None:
+        try:
+            response.close()   # Stops Ollama working on a prompt nobody will use
+        except Exception:
+            pass
@@ -1,44 +1,74 @@
+import importlib.util
 import os
 import subprocess
 import sys
-# List of required packages
-REQUIRED_PACKAGES = ["keyboard", "requests", "beautifulsoup4", "pyttsx3", "speechrecognition", "pyaudio"]
-
-# Marker file to indicate installation has been completed
-MARKER_FILE = "deps_installed.txt"
-
-def install_dependencies():
+import time
+STARTED = time.perf_counter()   # For the time-to-ready report
+
+# Required packages and the module each one provides
+REQUIRED_PACKAGES = {
+    "keyboard": "keyboard",
+    "requests": "requests",
+    "pyttsx3": "pyttsx3",
+    "speechrecognition": "speech_recognition",
+    "pyaudio": "pyaudio",
+    "numpy": "numpy",
+}
+
+def install_dependencies(packages):
     """Installs missing dependencies."""
-    for package in REQUIRED_PACKAGES:
+    for package in packages:
         subprocess.run([sys.executable, "-m", "pip", "install", package], check=True)
 
 def check_and_install():
-    """Check for marker file and install dependencies if needed."""
-    if not os.path.exists(MARKER_FILE):
-        print("Installing dependencies...")
-        install_dependencies()
-        with open(MARKER_FILE, "w") as f:
-            f.write("Dependencies installed.\n")
-        print("Installation complete. Marker file created.")
-    else:
-        print("All dependencies are already installed.")
-
-# Run the check
-check_and_install()
+    """Installs only the packages whose modules can't be found; pip is not started otherwise."""
+    missing = [package for package, module in REQUIRED_PACKAGES.items() if importlib.util.find_spec(module) is None]
+    if missing:
+        print(f"Installing dependencies: {', '.join(missing)}...")
+        install_dependencies(missing)
+        print("Installation complete.")
+
+# Run the check when started as the assistant; importing the module (tests, benchmarks) never runs pip
+if __name__ == "__main__":
+    check_and_install()
 
 
 import requests
-from bs4 import BeautifulSoup
-import pyttsx3
+import ttsworker
 import speech_recognition as sr
-import time
 import talkmod
 import re
 import keyboard
 import ollamamodel
+import ollamaclient
 from datetime import datetime
 import threading
-conversation_history = []
+import historystore
+import contextbuilder
+import pipeline
+import webfetch
+import htmltext
+import cmdexec
+import responsecache
+import intents
+import memoryrefiner
+import memoryindex
+import startup
+import tracing
+import turns
+import prompts
+import replies
+import sentences
+import speculate
+history_store = historystore.HistoryStore()
+# Typed turns of this session; only the newest turns.MAX_TURNS stay in memory, the rest are on disk
+conversation_history = turns.TurnLog(history_store)
+memory_cache = {"mtime": None, "text": "", "indexed_mtime": None}
+memory_index = memoryindex.MemoryIndex()
+OLLAMA_ERROR = replies.OLLAMA_ERROR
+
+# Stream tokens from Ollama and speak each finished sentence as it arrives.
+STREAM_RESPONSES = True
 
 
 
@@ -47,30 +77,40 @@ global current_date
 global current_time
 global memory
 
-def load_conversation_history():
-    """Loads the previous conversation history from a file."""
-    try:
-        if os.path.exists("conversation_history.txt"):
-            with open(f"conversation_history.txt", 'r') as file:
-                return file.read()
-        else:
-            print("No previous conversation history found.")
-            return ""
-    except Exception as e:
-        print(f"Error loading conversation history: {e}")
-        return "Failed to load the conversation history."
-
 def save_conversation_history():
-    """Saves the current conversation history to a file."""
+    """Appends conversation entries that have not been saved yet to the history store."""
     try:
-        with open("conversation_history.txt", 'a') as file:
-            # Convert each item in conversation_history to string
-            content = "\n model = {model}\n{current_date}\n{current_time}\n".join(str(item) for item in conversation_history)
-            file.write(content)
+        with tracing.span("save") as info:
+            saved = conversation_history.save()
+            info["entries"] = len(saved)
+            for turn in saved:
+                try:
+                    memory_index.add("history", turn.render())
+                except requests.exceptions.RequestException as e:
+                    print(f"Could not index conversation turn: {e}")
+            memory_index.save()
         print("Conversation history saved.")
     except Exception as e:
         print(f"Error saving conversation history: {e}")
 
+def load_memory(filepath="memory.txt"):
+    """Returns the memory file, only reading it again when it has changed on disk."""
+    try:
+        mtime = os.path.getmtime(filepath)
+    except OSError:
+        return ""
+    if memory_cache["mtime"] != mtime:
+        memory_cache["text"] = read_file(filepath)
+        memory_cache["mtime"] = mtime
+    if memory_cache["indexed_mtime"] != mtime and memory_index.enabled:
+        try:
+            memory_index.sync(filepath, memory_cache["text"])
+            memory_index.save()
+            memory_cache["indexed_mtime"] = mtime
+        except requests.exceptions.RequestException as e:
+            print(f"Could not index {filepath}: {e}")
+    return memory_cache["text"]
+
 
 def recognize_speech_from_mic():
     """Recognizes speech from the microphone."""
@@ -78,52 +118,25 @@ def recognize_speech_from_mic():
     with sr.Microphone() as source:
         try:
             audio = recognizer.listen(source)
-            user_input = recognizer.recognize_google(audio, language='en-US')
+            user_input = talkmod.get_stt().transcribe(audio)
             return user_input
         except sr.UnknownValueError:
-            print("Google Speech Recognition could not understand audio.")
+            print("Speech recognition could not understand audio.")
         except sr.RequestError as e:
-            print(f"Could not request results from Google Speech Recognition service; {e}")
+            print(f"Could not request results from the speech recognition service; {e}")
     return None
 
 
-engine = pyttsx3.init()
-engine.setProperty('rate', 150)  # Speech rate
-engine.setProperty('volume', 0.7)  # Volume level
-
 stop_speaking_flag = threading.Event()
+tts = ttsworker.TTSWorker(stop_flag=stop_speaking_flag)   # Started in __main__: it hooks the keyboard
 
-def speak(text):
-    """Speaks the given text and stops if the space bar is pressed."""
-    stop_speaking_flag.clear()  # Reset the flag before speaking
-
-    def stop_on_space(event):
-        """Stops speaking when the space bar is pressed."""
-        if event.name == "space":  # Check if the pressed key is 'space'
-            stop_speaking()
-
-    keyboard.on_press(stop_on_space)  # Listen for space bar press
-
-    def run_speech():
-        """Runs speech synthesis."""
-        global engine
-        try:
-            engine.say(text)
-            engine.runAndWait()
-        except RuntimeError as e:
-            print("Speech Error:", str(e))
-        finally:
-            stop_speaking_flag.clear()
-            keyboard.unhook_all()  # Remove key listener after speech ends
-
-    speech_thread = threading.Thread(target=run_speech, daemon=True)
-    speech_thread.start()
+def speak(text, priority=ttsworker.NORMAL):
+    """Queues text on the TTS worker. Pressing the space bar stops it."""
+    tts.say(text, priority)
 
 def stop_speaking():
-    """Stops speaking immediately."""
-    stop_speaking_flag.set()
-    engine.stop()
-    keyboard.unhook_all()  # Ensure key listener is removed
+    """Stops speaking immediately and drops anything still queued."""
+    tts.cancel()
 
 
 def show_help():
@@ -146,7 +159,7 @@ def read_file(filepath):
             return file.read()
     except Exception as e:
         print(f"Error reading file: {e}")
-        save_conversation_history(f"Error reading file; {e}")
+        conversation_history.append(f"Error reading file; {e}")
         return "Failed to read the file."
 
 def write_file(filepath, content):
@@ -161,40 +174,20 @@ def write_file(filepath, content):
 
 def fetch_web_content(url):
     """Fetches the web content from a given URL."""
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        return str(soup)
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching web content: {e}")
-        return ""
+    return webfetch.fetch(url)
 
 
-def clean_web_content(text):
+def clean_web_content(text, max_chars=htmltext.MAX_CHARS):
     """Remove HTML tags, CSS selectors, and JavaScript from web scraped data."""
-    # Create a BeautifulSoup object to parse the text
-    soup = BeautifulSoup(text, 'html.parser')
-    
-    # Remove all script tags
-    for script in soup(["script", "style"]):
-        script.decompose()
-    
-    # Extract only text within <div>, <span>, and <p> tags
-    filtered_text = []
-    for tag in soup(['div', 'span', 'p']):
-        filtered_text.append(tag.get_text(strip=True))
-    
-    # Join all the extracted texts into a single string
-    cleaned_text = ' '.join(filtered_text)
-    
-    return cleaned_text.strip()
+    return htmltext.extract_text(text, max_chars)
+
+MAX_SUMMARY_CHARS = 12000   # Page text sent for summarizing, keeps the prompt well inside num_ctx
 
 def summarize_web_content(text):
     """Summarizes the given text."""
     try:
-        text = clean_web_content(text)
-        return query_ollama_clean(f"SUMMARIZE: {text}")   # Ask Ollama to summarize the text
+        text = clean_web_content(text, MAX_SUMMARY_CHARS)
+        return query_ollama_clean(f"SUMMARIZE: {text}", role=ollamaclient.BACKGROUND)   # Ask Ollama to summarize the text
     except Exception as e:
         print(f"Error summarizing text: {e}")
         return "Failed to summarize the text."
@@ -209,7 +202,9 @@ def extract_code_from_response(response):
     try:
         # Extract all code blocks from the response
         code_blocks = re.findall(r"```(.*?)```", response, flags=re.DOTALL)
-        if not code_blocks or len(code_blocks) != 1:
+        if not code_blocks:
+            return None   # A plain answer; nothing to run and nothing worth a history entry
+        if len(code_blocks) != 1:
             print("Failed to extract valid code from Ollama's response. Response is not in the expected format.")
             conversation_history.append({"user": "Extracting code failed", "ollama": "Failed to parse response"})
             return None
@@ -232,95 +227,84 @@ def extract_code_from_response(response):
         return None
 
 
+command_executor = cmdexec.CommandExecutor()
+
+def command_turn(result):
+    """History turn for a finished command, with its output attached rather than inlined."""
+    attachments = []
+    if result.stdout.strip():
+        attachments.append(turns.Attachment("output", result.command, result.stdout.strip()))
+    if result.stderr.strip():
+        attachments.append(turns.Attachment("errors", result.command, result.stderr.strip()))
+    return turns.Turn("system", f"Executed command: {result.command} ({result.status()})", tuple(attachments))
+
 def execute_system_command(commands):
-    """Execute the given commands in separate shell processes."""
+    """Execute the given commands in separate shell processes and return their results."""
     
     # Convert single command to a list if necessary
     if not isinstance(commands, list):
         commands = [commands]
     
-    for command in commands:
-        try:
-            subprocess.Popen(command, shell=True)
-            print(f"Command '{command}' executed successfully.")
-            conversation_history.append({"System": f"Executed command: {command}", "Status": "Command executed successfully"})
-        except subprocess.CalledProcessError as e:
-            print(f"Failed to execute command '{command}': {e}")
-            conversation_history.append({"System": f"Executed command: {command}", "Status": f"Failed to execute command: {e}"})
-    return None
-
-def process_ollama_response(response):
-    """Process Ollama's response and execute any code blocks."""
-    try:
-        # Extract URLs from the response
-        urls = re.findall(r'https?://[^\s]+', response)
-        if urls:
-            for url in urls:
-                print(f"Fetched content from {url}")
-                web_content = fetch_web_content(url)
-                print(web_content)
-                summarized_content = query_ollama(f"SUMMARIZE: {web_content}")
-                conversation_history.append(f"Summarized content from {url}:")
-                conversation_history.append(f"{summarized_content}")
-                print(summarized_content)
-                speak(summarized_content)
-
-        # Extract and execute code blocks
-        extracted_code = extract_code_from_response(response)
-        if extracted_code:
-            print(f"Extracting command: {extracted_code}")
-            result = execute_system_command(extracted_code)
-            if result:
-                conversation_history.append({"user": "Executed command", "ollama": f"Command executed with result: {result}"})
+    results = command_executor.run_all(commands)
+    for result in results:
+        if result.ok:
+            print(f"Command '{result.command}' executed successfully.")
         else:
-            conversation_history.append({"user": "No code extracted", "ollama": "No valid code block found in response"})
-        print(response)    
-    except Exception as e:
-        error_message = f"An unexpected error occurred during processing. Details: {str(e)}"
-        print(error_message)
-        conversation_history.append(f"An error occurred: {error_message}")
-        save_conversation_history()
-    
-    return None
+            print(f"Failed to execute command '{result.command}': {result.status()}")
+        if result.stdout.strip():
+            print(result.stdout)
+        conversation_history.append(command_turn(result))
+    return results
+
+def summarize_urls(response, job=None):
+    """Fetches and summarizes every URL in Ollama's response in parallel, then speaks the summaries."""
+    urls = re.findall(r'https?://[^\s]+', response)
+    if not urls:
+        return
+    print(f"Fetching {len(urls)} page(s)...")
+    for url, summarized_content in webfetch.summarize_all(urls, summarize_web_content):
+        if job:
+            job.check()
+        print(f"Fetched content from {url}")
+        conversation_history.append(turns.Turn(
+            "system", f"Summarized content from {url}",
+            attachments=(turns.Attachment("url summary", url, summarized_content),)))
+        print(summarized_content)
+        speak(summarized_content, ttsworker.LOW)
+
+def run_response_commands(response):
+    """Extracts the code block from Ollama's response, executes it and returns the results."""
+    extracted_code = extract_code_from_response(response)
+    if extracted_code:
+        print(f"Extracting command: {extracted_code}")
+        return execute_system_command(extracted_code)
+    return []
 
 def refine_memory():
+    """Folds conversation turns that memory.txt hasn't seen yet into it, one batch at a time."""
+    print("Reading conversation history\nReading memory.txt\nSending to be organized.")
+    added = memory_refiner.run_once()
+    print(f"Finished Sumarization of Conversation and added {added} new facts to memory.txt")
 
-    def write_memory_file(filepath, content):
-        """Writes content to a file."""
-        try:
-            with open(filepath, 'a') as file:
-                file.write(content)
-            return f"Successfully wrote to {filepath}."
-        except Exception as e:
-            conversation_history.append(f"{current_date}{current_time}Failed to write to {filepath}: {e}")
-            return f"Failed to write to {filepath}: {e}"
-    file = read_file("conversation_history.txt")
-    print("History loaded")
-    
-    current_memory = read_file("memory.txt")
-    print("Memory loaded")
-    print("Reading converstation_history.txt\nReading memory.txt\nSending to be organized.")
-    memory = query_ollama_clean(f"""Analyze the conversation history and extract key details that contribute to successful outcomes.  
-        Retain previously stored memory while integrating newly found critical information.  
-        Structure the memory in a way that is clear and efficient for LLMs to process, ensuring continuity in understanding and execution.  
 
-        - Keep all previously stored memory intact.  
-        - Extract important successes from the conversation history.  
-        - Store details in a structured format that improves recall and decision-making.  
+def stream_ollama(data, on_sentence, endpoint="generate", prompt_tokens=None, role=ollamaclient.INTERACTIVE):
+    """Posts a generate or chat request with streaming on, passing each finished sentence to on_sentence.
 
-        Conversational History:
-        {file}
+    Returns the fully assembled response text so code blocks can still be extracted from it.
+    """
+    on_done = None if prompt_tokens is None else lambda chunk: record_prefill(chunk, prompt_tokens)
+    return replies.stream(endpoint, data, on_sentence, role=role, on_done=on_done)
 
-        Current Memory:
-        {current_memory}
-        """)
-    print(memory)
-    print("Finished Sumarization of Conversation and added to memory.txt")
-    write_memory_file("memory.txt", memory)
 
+response_cache = responsecache.ResponseCache()
 
-def query_ollama_clean(prompt):
-    
+def query_ollama_clean(prompt, on_sentence=None, cache=True, ttl=None, role=ollamaclient.INTERACTIVE):
+    """Sends a bare prompt to Ollama. Streams sentences to on_sentence when one is given.
+
+    Replies are cached by model, options and prompt, so repeated summaries and refinements skip
+    inference entirely. Pass cache=False to always ask the model, ttl to override the expiry, and
+    role=ollamaclient.BACKGROUND for work the user is not waiting on so it goes to a background server.
+    """
     try:
         data = {
             "model": model,
@@ -330,270 +314,372 @@ def query_ollama_clean(prompt):
             "temperature": 0.7,
             "top_p": 0.9,
             "options": {
-                "num_ctx": 12096
+                "num_ctx": prompts.NUM_CTX
             }
         }
-        OLLAMA_URL = "http://localhost:11434/api"
-        response = requests.post(f"{OLLAMA_URL}/generate", json=data)
-        response.raise_for_status()
-        print(response)
-        return response.json().get("response", "I have no response at the moment.")
+        key = responsecache.cache_key(data)
+        if cache:
+            cached = response_cache.get(key)
+            if cached is not None:
+                if on_sentence:
+                    splitter = sentences.SentenceSplitter()
+                    for sentence in splitter.feed(cached) + splitter.flush():
+                        on_sentence(sentence)
+                return cached
+
+        if on_sentence:
+            text = stream_ollama(data, on_sentence, role=role)
+        else:
+            response = ollamaclient.client.post("generate", json=data, role=role)
+            reply = response.json()
+            tracing.tracer.record_ollama(reply)
+            text = reply.get("response", replies.NO_RESPONSE)
+        if cache and text != replies.NO_RESPONSE:
+            response_cache.put(key, text, ttl)
+        return text
     except requests.exceptions.RequestException as e:
         print(f"Error communicating with SYSTEM: {e}")
-        return "I'm having trouble connecting to Ollama."
+        return OLLAMA_ERROR
         
 
 
-def query_ollama(prompt):
-    """Sends a prompt to Ollama and returns the response."""
-    current_memory = read_file("memory.txt")
-    conversation_history_str = load_conversation_history()
-    try:
-        full_prompt = f"""
-        Conversation History: {conversation_history}
-
-        Here is a catalog of successfully attempts stored in memory that you can recal on to help with completeing tasks if needed. 
-            
-        Memory Catalog: {current_memory}
-
-        Please retain and be concise and answer in the format that follows. 
-            What you just received in order:
-                1-Conversation History. A log of the converstaion with the user.
-                2-Memory Catalog. A log of successful attempts and stuff stored for training. 
-            what your going to receive in order:
-                1-User Task: the task the user wants you to complete. 
-                2-Reponse Format: instruction on how to respond to the user to complete the task.
-
-        User Task: {prompt}
-            
-        Response Format:
-            Ollama System Command & Execution Agent
-
-        Role Overview: You are an AI assistant with full access to execute system commands, perform file operations, interact with Windows and Linux systems, and conduct web searches. Your responses will be processed and executed directly, so it is crucial to follow the strict formatting guidelines precisely to ensure accurate execution.
-
-        System Command Execution: You can execute any system command or program, including running processes, terminating them, and modifying files on both Windows and Linux systems.
-
-            All commands must be formatted exactly as follows:
-            Windows Command:
-            cmd
-            ```            
-            command_here
-            ```
-            Linux Command:
-            bash
-            ```
-            command_here
-            ```
-            Example (Windows command):
-            cmd
-            ```
-            ping google.com
-            ```
-            Example (Linux command):
-            bash
-            ```
-            ping google.com
-            ```
-            File Operations:
-            Retrieve a list of files:
-            cmd            
-            ```
-            dir
-            ```
-            Read a file's contents:
-            cmd
-            ```
-            type filename.txt
-            ```
-            Write content to a file:
-            c
-            ```
-            echo Hello > filename.txt;
-            ```
-            List available system commands:
-            cmd
-            ```
-            help
-            ```
-            Web Searching: If user says search for ...? or If a query requires information retrieval, return a direct search URL for the query to enable automated web scraping and execution. Example search URL.
-
-            https://www.google.com/search?q=[your_query_here]
-            
-            Code Execution: Any code you generate must be enclosed in the following format:
-            code
-            ```
-            generated_code_here
-            ```
-
-            Example:
-            code            
-            ```
-            print("Hello, world!");
-            ```
-        Conversation History & Context Awareness: Maintain awareness of prior interactions to ensure relevant responses. to aid in generation of code and to remind the user of maybe things they forgot about or if the user set a reminder. 
-
-        Response Guidelines:
-
-            Always format system commands or code using the strict triple-backtick guidelines provided above.
-            For web searches, provide direct search URLs without additional explanation.
-            If executing code, ensure that it is enclosed in the proper format for execution.
-            Send back all commands needed for task at once. Each command separated by semicolon ;. 
-        
-            """
-        
-        data = {
-            "model": model,
-            "prompt": full_prompt,
-            "stream": False,
-            "n_predict": 250,
-            "temperature": 0.5,
-            "top_p": 0.9,
-            "options": {
-                "num_ctx": 12096
-            }
-        }
-        OLLAMA_URL = "http://localhost:11434/api"
-        response = requests.post(f"{OLLAMA_URL}/generate", json=data)
-        response.raise_for_status()
-        print(response)
+def summarize_conversation(prompt):
+    """Summarizer for history and memory; returns None when Ollama can't be reached.
 
-        
-        return response.json().get("response", "I have no response at the moment.")
+    Both run after the turn (the context builder folds in the background), so nobody waits on it.
+    """
+    summary = query_ollama_clean(prompt, role=ollamaclient.BACKGROUND)
+    return None if summary == OLLAMA_ERROR else summary
+
+context_builder = contextbuilder.ContextBuilder(summarize_conversation)
+memory_refiner = memoryrefiner.MemoryRefiner(
+    history_store, summarize_conversation,
+    is_idle=lambda: not turn_pipeline.busy and not tts.pending)
+
+
+prefill_stats = []        # (prompt tokens sent, tokens Ollama actually evaluated, prefill seconds)
+
+
+def record_prefill(reply, prompt_tokens):
+    """Records Ollama's prefill figures from a finished reply and prints how much was reused."""
+    evaluated = reply.get("prompt_eval_count")
+    duration = reply.get("prompt_eval_duration")
+    if evaluated is None or duration is None:
+        return
+    seconds = duration / 1e9
+    prefill_stats.append((prompt_tokens, evaluated, seconds))
+    reused = max(0, prompt_tokens - evaluated)
+    print(f"Prefill: {evaluated} tokens evaluated in {seconds * 1000:.0f} ms (~{reused} reused from cache)")
+
+
+def print_prefill_stats():
+    """Prints average prefill cost per turn so cached and uncached runs can be compared."""
+    if not prefill_stats:
+        return
+    turns = len(prefill_stats)
+    sent = sum(stat[0] for stat in prefill_stats) / turns
+    evaluated = sum(stat[1] for stat in prefill_stats) / turns
+    seconds = sum(stat[2] for stat in prefill_stats) / turns
+    print(f"Prefill over {turns} turns: ~{sent:.0f} tokens sent, {evaluated:.0f} evaluated, {seconds * 1000:.0f} ms average")
+
+
+def preload_model(model_name):
+    """Loads the model into Ollama ahead of the first turn with an empty generate request.
+
+    num_ctx has to match the real requests, otherwise Ollama reloads the model on the first turn.
+    """
+    ollamaclient.client.post("generate", json={
+        "model": model_name,
+        "keep_alive": prompts.KEEP_ALIVE,
+        "options": {"num_ctx": prompts.NUM_CTX},
+    }).close()
+
+
+def build_context(prompt):
+    """Returns (history_text, memory_text) for a prompt: relevant memory and history within the token budget.
+
+    Built before the user's turn is added to the history, so the task is not repeated in it.
+    """
+    current_memory = load_memory()
+    # Only send the memory and past turns that are relevant to this request
+    relevant = memoryindex.safe_search(memory_index, prompt)
+    if relevant is not None:
+        current_memory = memoryindex.format_results(relevant)
+    # Keep history + memory inside the token budget: recent turns verbatim, older ones summarized
+    return context_builder.build(
+        conversation_history, current_memory, reserved=contextbuilder.estimate_tokens(prompt))
+
+
+def build_request(user_prompt, **options):
+    """Returns (endpoint, request data) for a turn with the selected model."""
+    return prompts.build_request(model, user_prompt, **options)
+
+
+def query_ollama(prompt, on_sentence=None, context=None):
+    """Sends a prompt to Ollama and returns the response.
+
+    When on_sentence is given the reply is streamed and each sentence is passed to it as soon as it is complete.
+    context is a build_context() result prepared earlier, e.g. by speculation; it is built now if missing.
+    """
+    try:
+        if context is None:
+            context = build_context(prompt)
+        user_prompt = prompts.build_user_prompt(prompt, context)
+        prompt_tokens = contextbuilder.estimate_tokens(prompts.SYSTEM_PROMPT + user_prompt)
+        endpoint, data = build_request(user_prompt)
+
+        if on_sentence:
+            return stream_ollama(data, on_sentence, endpoint=endpoint, prompt_tokens=prompt_tokens)
+        response = ollamaclient.client.post(endpoint, json=data)
+
+        reply = response.json()
+        tracing.tracer.record_ollama(reply)
+        record_prefill(reply, prompt_tokens)
+        if prompts.USE_CHAT:
+            return reply.get("message", {}).get("content") or replies.NO_RESPONSE
+        return reply.get("response", replies.NO_RESPONSE)
     except requests.exceptions.RequestException as e:
         print(f"Error communicating with SYSTEM: {e}")
-        return "I'm having trouble connecting to Ollama."
+        return OLLAMA_ERROR
 
 
 
 
-def basefunctions(user_input):
+SPECULATE = os.environ.get("SPECULATE", "1") == "1"   # Prepare each request from partial transcripts
 
-    #Here you can extend off the model and do simple worded call commands to execute functions.
-    #This is where you would add things like turn of the lights or check my email. 
+def prefill_speculation(context, text):
+    """Sends the prompt for a partial transcript with a one-token reply so Ollama caches its prefix.
 
-    # Handle exit commands
-    if user_input.lower() in ["exit", "quit", "goodbye"]:
-        print("Goodbye!")
-        speak("Goodbye!")
-        save_conversation_history()
-        exit()
+    The final prompt differs only after "User Task:", so its prefill is mostly served from that cache.
+    """
+    endpoint, data = build_request(prompts.build_user_prompt(text, context), num_predict=1)
+    return ollamaclient.client.post(endpoint, json=dict(data, stream=True), stream=True)
 
-    # Handle 'stop' command
-    elif user_input.lower() == "stop":
-        stop_speaking()
-        print("Stop command received. Speech stopped.")
-    
-    # Handle help command
-    elif user_input.lower() == "show help":
-        show_help()
-        next 
-    
-    # Handle time commands
-    elif user_input.lower() in ["what's the time", "what time is it"]:
-        current_time = time.strftime("%I:%M %p")
-        print(f"The time is {current_time}.")
-        speak(f"The time is {current_time}.")
-        next
-    elif user_input.lower() in ["what's the date", "what date is it"]:
-        current_date = datetime.now().strftime("%Y-%m-%d")
-        print(f"Today's date is {current_date}.")
-        speak(f"Today's date is {current_date}.")
-        next
-    elif user_input.lower() in ["find", "look for", "where is"]:
-        execute_command(query_ollama("send back dir command with file name {user_input} to search for to be read."))
-    return user_input
+# The history length is the context's version: a turn finishing mid-speech invalidates a speculation
+speculator = speculate.Speculator(build_context, prefill_speculation, version=lambda: len(conversation_history))
+
+
+#Here you can extend off the model and do simple worded call commands to execute functions.
+#This is where you would add things like turn of the lights or check my email: drop a file in
+#plugins/ that uses @intents.intent("lights", phrases=["turn off the lights"]) on a handler.
+#Intents that stop or shut down the assistant use fuzzy=False: "quiet" or "quite" must not count as "quit".
+
+@intents.intent("exit", phrases=["exit", "quit", "goodbye"], fuzzy=False)
+def exit_intent(text, argument):
+    print("Goodbye!")
+    speak("Goodbye!", ttsworker.URGENT)
+    save_conversation_history()
+    tts.wait(timeout=5)
+    exit()
+
+@intents.intent("stop", phrases=["stop", "stop talking", "be quiet"], fuzzy=False)
+def stop_intent(text, argument):
+    stop_speaking()
+    turn_pipeline.cancel()
+    print("Stop command received. Speech stopped.")
+
+@intents.intent("help", phrases=["show help", "help"])
+def help_intent(text, argument):
+    show_help()
+
+@intents.intent("time", phrases=["what's the time", "what time is it", "tell me the time", "what is the time"])
+def time_intent(text, argument):
+    current_time = time.strftime("%I:%M %p")
+    print(f"The time is {current_time}.")
+    speak(f"The time is {current_time}.", ttsworker.URGENT)
+    conversation_history.append({"user": text, "ollama": f"The time is {current_time}."})
+
+@intents.intent("date", phrases=["what's the date", "what date is it", "what is the date", "what's today's date"])
+def date_intent(text, argument):
+    current_date = datetime.now().strftime("%Y-%m-%d")
+    print(f"Today's date is {current_date}.")
+    speak(f"Today's date is {current_date}.", ttsworker.URGENT)
+    conversation_history.append({"user": text, "ollama": f"Today's date is {current_date}."})
+
+# Only an explicit file search; "find me a recipe" or "where is the eiffel tower" go to the LLM
+@intents.intent("find", phrases=["find file", "find the file", "search for file", "where is the file"], takes_args=True)
+def find_intent(text, argument):
+    if not argument:
+        return False   # Nothing to look for; let the LLM handle it
+    extracted_code = extract_code_from_response(
+        query_ollama_clean(f"send back dir command with file name {argument} to search for to be read."))
+    if extracted_code:
+        execute_system_command(extracted_code)
+
+def basefunctions(user_input):
+    """Handles simple commands locally. Returns the intent name if the LLM isn't needed."""
+    handled = intents.router.handle(user_input)
+    if handled:
+        print(f"Handled locally: {handled}")
+    return handled
     
-def menu():
+MENU_SECONDS = float(os.environ.get("MENU_SECONDS", 5))   # How long the startup menu waits; 0 skips it
 
-    count = 0
-    while count < 5:
-        os.system("cls")
 
+def menu(seconds=MENU_SECONDS):
+    """Waits briefly for F5 (continue) or F7 (update memory) while startup finishes in the background."""
+    if seconds <= 0:
+        return
+    print("Press F5 to continue or F7 to Update Memory from conversation history.")
+    deadline = time.perf_counter() + seconds
+    shown = None
+    while time.perf_counter() < deadline:
         if keyboard.is_pressed("f5"):
-            print("Continuing...")
-            break  # Exit the loop when F5 is pressed
-        
-        elif keyboard.is_pressed("f7"):
-            print("Organizing Thoughts...")
+            print("\nContinuing...")
+            return
+        if keyboard.is_pressed("f7"):
+            print("\nOrganizing Thoughts...")
             refine_memory()
-            break  # Exit the loop when F7 is pressed
-        print(f"""Press F5 to continue or F7 to Update Memory from conversation history.\n
-            {count} Seconds Remaining""")
-        time.sleep(1)
-        count += 1
+            return
+        remaining = int(deadline - time.perf_counter()) + 1
+        if remaining != shown:
+            shown = remaining
+            print(f"\r{remaining} Seconds Remaining ", end="", flush=True)
+        time.sleep(0.05)
+    print()
+
+
+MAX_RESOLVE_ATTEMPTS = 1   # Times a failed turn is sent back to Ollama to fix
+
+
+def speaker_for(job, priority=ttsworker.NORMAL):
+    """Returns an on_sentence callback that speaks until the job is cancelled."""
+    def speak_sentence(sentence):
+        if job:
+            job.check()
+        speak(sentence, priority)
+    return speak_sentence
+
+def generate_stage(job):
+    """Pipeline stage: asks Ollama for a reply to the user's input."""
+    user_input = job["user_input"]
+    context = job.get("context")   # Already built while the user was speaking if speculation hit
+    if context is None:
+        with tracing.span("prompt_build"):
+            context = build_context(user_input)
+    conversation_history.append(turns.Turn("user", user_input))
+    if STREAM_RESPONSES:
+        job["response"] = query_ollama(user_input, on_sentence=speaker_for(job), context=context)
+    else:
+        job["response"] = query_ollama(user_input, context=context)
+    stripped_response = replies.strip_code(job["response"])
+    conversation_history.append(turns.Turn("assistant", stripped_response))
+    print(stripped_response)
+
+def fetch_stage(job):
+    """Pipeline stage: fetches and summarizes any URLs in the reply."""
+    summarize_urls(job["response"], job)
+
+def execute_stage(job):
+    """Pipeline stage: runs the command block from the reply; failures go back to Ollama to resolve."""
+    job["command_results"] = run_response_commands(job["response"])
+    failed = [result for result in job["command_results"] if not result.ok]
+    if failed:
+        details = "; ".join(f"{result.command}: {result.status()} {result.stderr.strip()[-500:]}" for result in failed)
+        # Not job.error: that would skip speak_stage, and the reply should still be heard
+        job["command_error"] = RuntimeError(f"Command failed. {details}")
+
+def speak_stage(job):
+    """Pipeline stage: speaks the reply when it was not already streamed sentence by sentence."""
+    if not STREAM_RESPONSES:
+        speak(replies.strip_code(job["response"]))
+
+def persist_stage(job):
+    """Pipeline stage: saves history, and sends failed turns back to Ollama to resolve."""
+    error = job.error or job.get("command_error")
+    if error:
+        error_message = f"An unexpected error occurred during processing. Details: {error}"
+        conversation_history.append(f"An error occurred: {error_message}")
+        if job.get("attempt", 0) < MAX_RESOLVE_ATTEMPTS and not job.cancelled.is_set():
+            retry = pipeline.Job(user_input=f"Results of code sent please resolve: {job['user_input']} {error_message}",
+                                 attempt=job.get("attempt", 0) + 1, turn=job.get("turn"))
+            try:
+                turn_pipeline.submit(retry, block=False)
+            except Exception:
+                print("Pipeline is busy; not retrying the failed turn.")
+    save_conversation_history()
+    context_builder.fold_in_background(conversation_history)   # Ready for a later turn; this one did not wait
+    tracing.tracer.add("turn", job.created, time.perf_counter() - job.created,
+                       cancelled=job.cancelled.is_set(), error=error is not None)
+    tracing.tracer.flush()
+    if len(history_store) - history_store.get_mark(memoryrefiner.MARK) >= memoryrefiner.BATCH_SIZE:
+        memory_refiner.poke()   # A full batch is waiting; consolidate it once the assistant is idle
+
+def assistant_speaking():
+    """True while speech is queued or playing; hands-free listening ignores the microphone then."""
+    return tts.pending > 0
+
+turn_pipeline = pipeline.Pipeline([
+    pipeline.Stage("generate", generate_stage),
+    pipeline.Stage("fetch", fetch_stage),
+    pipeline.Stage("execute", execute_stage),
+    pipeline.Stage("speak", speak_stage),
+    pipeline.Stage("persist", persist_stage, always=True, maxsize=8),
+], on_cancel=lambda: stop_speaking())
 
 
 def main():
+    turn_pipeline.start()
+    turn = 0
     try:
-        ollama_response = ""
         while True:
             # Initialize current_date and current_time
             global current_date, current_time
             current_date = datetime.now().strftime("%Y-%m-%d")
             current_time = time.strftime("%I:%M %p")
  
-            # Get user input
-
-            user_input = talkmod.record_and_transcribe()
-            basefunctions(user_input)
+            # Get user input while the previous turn is still being processed
+            turn += 1
+            tracing.set_turn(turn)   # Spans for this turn's record, transcribe and pipeline stages
+            if SPECULATE:
+                speculator.begin()
+                user_input = talkmod.record_and_transcribe(on_partial=speculator.on_partial, is_speaking=assistant_speaking)
+            else:
+                user_input = talkmod.record_and_transcribe(is_speaking=assistant_speaking)
+            if turn_pipeline.busy:
+                print("Interrupted previous reply.")
+                turn_pipeline.cancel()   # The user barged in; drop the rest of the old turn
             print(f"You said: {user_input}")
-            conversation_history.append(f"User: {user_input}")
+            if basefunctions(user_input):
+                speculator.cancel()
+                continue   # Answered without a round trip to Ollama
 
-            # Process Ollama response
-            ollama_response = query_ollama(user_input)
-            
-            try:
-                process_ollama_response(ollama_response)
-                try:
-                    stripped_response = re.sub(r'```([\s\S]*?)```', '', ollama_response)
-                    conversation_history.append(f"SYSTEM: {stripped_response}")
-                    print(stripped_response)
-                    
-
-                except Exception as e:
-                    print(f"Error processing response: {e}")
-                    conversation_history.append(f"Error processing response: {e}")
-                    user_input = user_input + e
-            except Exception as e:
-                error_message = f"An unexpected error occurred during processing. Details: {e}"
-                print(error_message)
-                conversation_history.append(f"An error occurred: {error_message}")
-                user_input = user_input + error_message
-                
-            save_conversation_history()
-        while e or error_message:
-            
-            ollama_response = query_ollama(f"Results of code sent please resolve: {user_input}")
-            
-            try:
-                process_ollama_response(ollama_response)
-                try:
-                    stripped_response = re.sub(r'```([\s\S]*?)```', '', ollama_response)
-                    conversation_history.append(f"SYSTEM: {stripped_response}")
-                    print(stripped_response)
-                    
-
-                except Exception as e:
-                    print(f"Error processing response: {e}")
-                    conversation_history.append(f"Error processing response: {e}")
-                    user_input = user_input + e
-            except Exception as e:
-                error_message = f"An unexpected error occurred during processing. Details: {e}"
-                print(error_message)
-                conversation_history.append(f"An error occurred: {error_message}")
-                user_input = user_input + error_message
-                save_conversation_history()
+            context = speculator.commit(user_input) if SPECULATE else None
+            turn_pipeline.submit(pipeline.Job(user_input=user_input, turn=turn, context=context))
 
     except KeyboardInterrupt:
         print("\nExiting. Goodbye!")
-        speak("Goodbye!")
+        turn_pipeline.cancel()
+        turn_pipeline.stop(timeout=5)
+        command_executor.shutdown()
+        speak("Goodbye!", ttsworker.URGENT)
         save_conversation_history()
+        ollamaclient.client.print_stats()
+        print(f"Speech: {tts.stats()}")
+        print_prefill_stats()
+        response_cache.print_stats()
+        speculator.print_stats()
+        tracing.tracer.print_summary()
+        tracing.tracer.close()
+        tts.wait(timeout=5)
 
 if __name__ == "__main__":
 
+    # Everything that doesn't need the model name warms up while the user picks one
+    warmup = startup.Warmup(STARTED)
+    tts.start()
+    warmup.add("tts", tts.ready.wait, startup.WARMUP_TIMEOUT)
+    warmup.add("audio", talkmod.warm_up)
+    warmup.add("memory", load_memory)
+    intents.load_plugins()
     model = ollamamodel.get_ollama_model_http()
+    if model:
+        warmup.add("model", preload_model, model)
     menu()
+    warmup.wait()
+    warmup.report()
+    memory_refiner.start()
     print("Welcome to Voice Interaction with Ollama!")
-    speak("Welcome back, Sir!")
+    speak("Welcome back, Sir!", ttsworker.URGENT)
     main()
     save_conversation_history()
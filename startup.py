@@ -0,0 +1,56 @@
+import threading
+import time
+
+WARMUP_TIMEOUT = 30   # Seconds to wait for warm-up before starting anyway
+
+
+class Warmup:
+    """Runs independent startup tasks (model load, microphone, TTS, memory) at the same time.
+
+    A task that fails or is still running at the deadline does not stop startup; it is only
+    reported, and whatever it was preparing gets set up on first use instead.
+    """
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.tasks = {}       # name -> thread
+        self.timings = {}     # name -> seconds taken
+        self.errors = {}      # name -> exception
+        self.lock = threading.Lock()
+
+    def add(self, name, func, *args):
+        """Starts func(*args) in a daemon thread right away."""
+        thread = threading.Thread(target=self._run, args=(name, func, args), name=f"warmup-{name}", daemon=True)
+        self.tasks[name] = thread
+        thread.start()
+        return thread
+
+    def _run(self, name, func, args):
+        start = time.perf_counter()
+        try:
+            func(*args)
+        except Exception as e:
+            with self.lock:
+                self.errors[name] = e
+        with self.lock:
+            self.timings[name] = time.perf_counter() - start
+
+    def wait(self, timeout=WARMUP_TIMEOUT):
+        """Waits for every task, up to timeout seconds in total. Returns the names still running."""
+        deadline = time.perf_counter() + timeout
+        for thread in self.tasks.values():
+            thread.join(max(0.0, deadline - time.perf_counter()))
+        return [name for name, thread in self.tasks.items() if thread.is_alive()]
+
+    def report(self):
+        """Prints time-to-ready and how long each task took."""
+        pending = [name for name, thread in self.tasks.items() if thread.is_alive()]
+        with self.lock:
+            parts = [f"{name} {seconds:.1f}s" for name, seconds in sorted(self.timings.items())
+                     if name not in self.errors]
+            parts += [f"{name} failed ({error})" for name, error in sorted(self.errors.items())]
+        parts += [f"{name} still running" for name in pending]
+        print(f"Ready in {self.ready_seconds():.1f}s ({', '.join(parts)})")
+
+    def ready_seconds(self):
+        return time.perf_counter() - self.started
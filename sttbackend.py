@@ -0,0 +1,133 @@
+import json
+import os
+
+import speech_recognition as sr
+
+import vad
+
+try:
+    import vosk
+except ImportError:   # Offline recognition needs `pip install vosk` and a downloaded model
+    vosk = None
+
+# "vosk" for local offline recognition, "google" for the online recognizer, or "auto".
+STT_BACKEND = os.environ.get("STT_BACKEND", "auto")
+VOSK_MODEL_PATH = os.environ.get("VOSK_MODEL_PATH", "vosk-model-small-en-us-0.15")
+SAMPLE_WIDTH = 2      # 16-bit PCM
+
+
+class STTBackend:
+    """Speech-to-text engine fed with raw 16-bit mono PCM while the user is still talking.
+
+    start() begins an utterance, feed() takes each chunk and may return a partial hypothesis,
+    finish() returns the final transcript. Failures raise the speech_recognition exceptions
+    (UnknownValueError / RequestError) so callers handle every backend the same way.
+    """
+
+    name = "base"
+
+    def start(self, rate):
+        raise NotImplementedError
+
+    def feed(self, chunk):
+        raise NotImplementedError
+
+    def finish(self):
+        raise NotImplementedError
+
+    def transcribe(self, audio_data):
+        """Transcribes a complete sr.AudioData in one go."""
+        self.start(audio_data.sample_rate)
+        self.feed(audio_data.get_raw_data(convert_width=SAMPLE_WIDTH))
+        return self.finish()
+
+
+class GoogleBackend(STTBackend):
+    """Online Google recognizer. Needs network access and only decodes after recording ends."""
+
+    name = "google"
+
+    def __init__(self, language="en-US"):
+        self.language = language
+        self.recognizer = sr.Recognizer()
+        self.rate = None
+        self.chunks = []
+
+    def start(self, rate):
+        self.rate = rate
+        self.chunks = []
+
+    def feed(self, chunk):
+        self.chunks.append(chunk)
+        return None   # No partial results
+
+    def finish(self):
+        # Only upload the speech itself, not the silence around it. Speech too quiet for the
+        # detector is still sent whole, as it was before trimming, and left to the recognizer.
+        audio = b"".join(self.chunks)
+        speech = vad.trim_silence(audio, self.rate) or audio
+        self.chunks = []
+        if not speech:
+            raise sr.UnknownValueError()
+        audio_data = sr.AudioData(speech, self.rate, SAMPLE_WIDTH)
+        return self.recognizer.recognize_google(audio_data, language=self.language)
+
+
+class VoskBackend(STTBackend):
+    """Local CPU recognizer that decodes each chunk as it arrives and reports partial text."""
+
+    name = "vosk"
+
+    def __init__(self, model_path=VOSK_MODEL_PATH):
+        vosk.SetLogLevel(-1)
+        self.model = vosk.Model(model_path)
+        self.recognizer = None
+        self.segments = []
+
+    def start(self, rate):
+        self.recognizer = vosk.KaldiRecognizer(self.model, rate)
+        self.segments = []
+
+    def feed(self, chunk):
+        if not chunk:
+            return None
+        if self.recognizer.AcceptWaveform(bytes(chunk)):
+            # Vosk found a pause and finalized a segment
+            text = json.loads(self.recognizer.Result()).get("text", "")
+            if text:
+                self.segments.append(text)
+            return " ".join(self.segments) or None
+        partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        return " ".join(self.segments + [partial]).strip() or None
+
+    def finish(self):
+        text = json.loads(self.recognizer.FinalResult()).get("text", "")
+        if text:
+            self.segments.append(text)
+        transcript = " ".join(self.segments).strip()
+        self.segments = []
+        if not transcript:
+            raise sr.UnknownValueError()
+        return transcript
+
+
+BACKENDS = {"google": GoogleBackend, "vosk": VoskBackend}
+
+
+def get_backend(name=STT_BACKEND):
+    """Returns the configured backend. "auto" prefers Vosk when it and its model are installed."""
+    if name == "auto":
+        name = "vosk" if vosk is not None and os.path.isdir(VOSK_MODEL_PATH) else "google"
+    if name == "vosk" and vosk is None:
+        print("Vosk is not installed, falling back to Google speech recognition.")
+        name = "google"
+    try:
+        backend = BACKENDS[name]()
+    except KeyError:
+        print(f"Unknown speech backend '{name}', using Google speech recognition.")
+        backend = GoogleBackend()
+    except Exception as e:
+        print(f"Could not start {name} speech recognition ({e}), using Google speech recognition.")
+        backend = GoogleBackend()
+    print(f"Speech recognition backend: {backend.name}")
+    return backend
@@ -1,71 +1,243 @@
+import os
+import threading
 import keyboard
 import pyaudio
-import wave
 import speech_recognition as sr
+import sttbackend
+import tracing
+import vad
 
-def record_audio(filename="audio.wav"):
-    """Records audio while the SPACE key is held and saves it as a WAV file."""
-    chunk = 1024  # Bytes per chunk
-    samprate = 44100  # Sampling rate
-    channels = 1
-    format = pyaudio.paInt16  # Audio format
+SAMPLE_RATE = int(os.environ.get("TALKMOD_SAMPLE_RATE", 16000))  # 16 kHz is plenty for speech
+CHUNK = 1024          # Frames per read
+CHANNELS = 1
+SAMPLE_WIDTH = 2      # Bytes per sample (paInt16)
+MAX_SECONDS = 60      # Longest utterance the buffer holds
+HANDS_FREE = os.environ.get("TALKMOD_HANDS_FREE", "0") == "1"   # Voice activity detection instead of push-to-talk
+ECHO_HOLD_MS = int(os.environ.get("TALKMOD_ECHO_HOLD_MS", 300))  # Hands-free: microphone stays muted this long after the assistant stops talking
 
-    audio = pyaudio.PyAudio()
 
+class AudioCapture:
+    """Keeps one microphone stream open and records utterances into a preallocated buffer.
+
+    Any object with read(frames, exception_on_overflow=False), start_stream(), stop_stream() and
+    close() can be passed as stream, which makes it easy to feed in a fake audio source.
+    """
+
+    def __init__(self, rate=SAMPLE_RATE, chunk=CHUNK, max_seconds=MAX_SECONDS, stream=None):
+        self.rate = rate
+        self.chunk = chunk
+        self.buffer = bytearray(rate * SAMPLE_WIDTH * CHANNELS * max_seconds)
+        self.view = memoryview(self.buffer)
+        self.length = 0
+        self.audio = None
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def open(self):
+        """Opens the input device once; later utterances reuse the same stream."""
+        with self.lock:   # Startup may open it in the background while the first turn begins
+            if self.stream is None:
+                self.audio = pyaudio.PyAudio()
+                self.stream = self.audio.open(format=pyaudio.paInt16, channels=CHANNELS, rate=self.rate,
+                                              input=True, frames_per_buffer=self.chunk, start=False)
+
+    def start(self):
+        """Clears the buffer and starts pulling audio from the device."""
+        self.open()
+        self.length = 0
+        self.stream.start_stream()
+
+    def stop(self):
+        """Pauses the device without closing it so the next utterance starts instantly."""
+        self.stream.stop_stream()
+
+    def read_chunk(self, keep=True):
+        """Reads one chunk into the buffer and returns it. Returns b"" once the buffer is full.
+
+        With keep=False the chunk is only returned, e.g. in hands-free mode, where the voice
+        activity detector decides what is passed on and silence must not fill the buffer.
+        """
+        data = self.stream.read(self.chunk, exception_on_overflow=False)
+        if not keep:
+            return data
+        space = len(self.buffer) - self.length
+        if space <= 0:
+            return b""
+        data = data[:space]
+        self.view[self.length:self.length + len(data)] = data
+        self.length += len(data)
+        return data
+
+    @property
+    def full(self):
+        return self.length >= len(self.buffer)
+
+    def audio_data(self):
+        """Returns what was recorded as AudioData, ready for the recognizer."""
+        return sr.AudioData(bytes(self.view[:self.length]), self.rate, SAMPLE_WIDTH)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if self.audio is not None:
+            self.audio.terminate()
+            self.audio = None
+
+
+capture = AudioCapture()
+stt = None              # Speech backend, loaded on first use or by warm_up()
+stt_lock = threading.Lock()
+
+
+def get_stt():
+    """Returns the speech backend, loading it (which can take seconds for Vosk) the first time."""
+    global stt
+    with stt_lock:
+        if stt is None:
+            stt = sttbackend.get_backend()
+        return stt
+
+
+def warm_up():
+    """Opens the microphone and loads the speech backend so the first utterance starts instantly."""
+    capture.open()
+    get_stt()
+
+
+def record_audio():
+    """Records audio while the SPACE key is held and returns it as AudioData."""
     print("\nPress and hold SPACE to start recording... (Press ESC to exit)")
-    
+    capture.open()
+
     keyboard.wait("space")  # Wait until SPACE is pressed
     print("Recording started... Release SPACE to stop.")
+    with tracing.span("record"):
+        capture.start()
+
+        # Record while SPACE is held down
+        while keyboard.is_pressed("space") and not capture.full:
+            capture.read_chunk()
 
-    # Open audio stream
-    audio_stream = audio.open(format=format, channels=channels, rate=samprate,
-                              input=True, frames_per_buffer=chunk)
+        capture.stop()
+    print("Recording stopped.")
 
-    frames = []
+    return capture.audio_data()
 
-    # Record while SPACE is held down
-    while keyboard.is_pressed("space"):
-        data = audio_stream.read(chunk)
-        frames.append(data)
 
-    print("Recording stopped.")
+def transcribe_audio(audio_data):
+    """Transcribes AudioData (or a WAV file path) and returns the recognized text."""
+    try:
+        if isinstance(audio_data, str):
+            recognizer = sr.Recognizer()
+            with sr.AudioFile(audio_data) as source:
+                audio_data = recognizer.record(source)
+        with tracing.span("transcribe"):
+            return get_stt().transcribe(audio_data)  # Return the transcription
+    except sr.UnknownValueError:
+        return "Speech recognition could not understand the audio."
+    except sr.RequestError as e:
+        return f"Speech recognition request failed: {e}"
+
+
+def listen_and_transcribe(on_partial=None, is_speaking=None):
+    """Hands-free recording: waits for speech, ends after a pause, and returns the transcribed text.
+
+    Only the frames the voice activity detector marks as speech are passed to the recognizer, and
+    nothing is buffered while waiting, so silence can last any length. An utterance that cannot
+    be understood (a cough, a door) is dropped and listening simply goes on.
 
-    # Stop and close the stream
-    audio_stream.stop_stream()
-    audio_stream.close()
-    audio.terminate()
+    Listening is half-duplex: while is_speaking() is true, and for ECHO_HOLD_MS after, the
+    microphone is ignored so the assistant's own voice from the speakers is not taken for the
+    user. Speech that started before the assistant did ends there and is transcribed.
+    """
+    print("\nListening... (speak at any time)")
+    endpointer = vad.Endpointer(capture.rate)
+    stt = get_stt()
+    limit = len(capture.buffer)   # Longest utterance, as in push-to-talk mode
+    echo_hold = capture.rate * SAMPLE_WIDTH * ECHO_HOLD_MS // 1000
+    hold = 0                      # Bytes of audio still to ignore after the assistant stopped
+    capture.start()
 
-    # Save audio to WAV file
-    with wave.open(filename, "wb") as wf:
-        wf.setnchannels(channels)
-        wf.setsampwidth(audio.get_sample_size(format))
-        wf.setframerate(samprate)
-        wf.writeframes(b"".join(frames))
+    try:
+        while True:
+            endpointer.reset()
+            stt.start(capture.rate)
+            spoken = 0
+            last_partial = None
+            with tracing.span("record", hands_free=True):
+                while not endpointer.done and spoken < limit:
+                    chunk = capture.read_chunk(keep=False)
+                    speaking = is_speaking is not None and is_speaking()
+                    if speaking or hold > 0:
+                        hold = echo_hold if speaking else hold - len(chunk)
+                        if endpointer.triggered:
+                            break
+                        endpointer.reset()   # Forget any echo the detector started counting
+                        continue
+                    speech = endpointer.process(chunk)
+                    if not speech:
+                        continue
+                    spoken += len(speech)
+                    partial = stt.feed(speech)
+                    if partial and partial != last_partial:
+                        last_partial = partial
+                        print(f"... {partial}")
+                        if on_partial:
+                            on_partial(partial)
+            try:
+                with tracing.span("transcribe"):
+                    text = stt.finish()
+            except sr.UnknownValueError:
+                text = ""
+            if text and text.strip():
+                print("Recording stopped.")
+                return text
+            print("Didn't catch that, still listening...")
+    except sr.RequestError as e:
+        return f"Speech recognition request failed: {e}"
+    finally:
+        capture.stop()
 
-    return filename  # Return the filename for further processing
 
+def record_and_transcribe(on_partial=None, is_speaking=None):
+    """Records while SPACE is held, decoding as it goes, and returns the transcribed text.
+
+    Backends that support it decode each chunk during recording, so the final text is ready
+    almost as soon as SPACE is released. on_partial is called with each new partial hypothesis.
+    In hands-free mode the utterance is found by voice activity detection instead, and the
+    microphone is ignored while is_speaking() says the assistant is talking.
+    """
+    if HANDS_FREE:
+        return listen_and_transcribe(on_partial, is_speaking)
+    print("\nPress and hold SPACE to start recording... (Press ESC to exit)")
+    capture.open()
 
-def transcribe_audio(filename="audio.wav"):
-    """Transcribes audio from a WAV file and returns the recognized text."""
-    recognizer = sr.Recognizer()
+    keyboard.wait("space")  # Wait until SPACE is pressed
+    print("Recording started... Release SPACE to stop.")
+    stt = get_stt()
+    capture.start()
+    stt.start(capture.rate)
 
     try:
-        with sr.AudioFile(filename) as source:
-            audio_data = recognizer.record(source)
-            result = recognizer.recognize_google(audio_data)
-            return result  # Return the transcription
+        last_partial = None
+        with tracing.span("record"):
+            while keyboard.is_pressed("space") and not capture.full:
+                partial = stt.feed(capture.read_chunk())
+                if partial and partial != last_partial:
+                    last_partial = partial
+                    print(f"... {partial}")
+                    if on_partial:
+                        on_partial(partial)
+            capture.stop()
+        print("Recording stopped.")
+        with tracing.span("transcribe"):
+            return stt.finish()
     except sr.UnknownValueError:
         return "Speech recognition could not understand the audio."
     except sr.RequestError as e:
         return f"Speech recognition request failed: {e}"
 
-
-def record_and_transcribe():
-    """Records audio and returns the transcribed text."""
-    audio_file = record_audio()
-    transcript = transcribe_audio(audio_file)
-    return transcript
-
 if __name__ == "__main__":
     while True:
         transcript = record_and_transcribe()
@@ -73,17 +245,17 @@ if __name__ == "__main__":
 
         # If speech recognition fails, restart the loop
         if transcript == "Speech recognition could not understand the audio.":
-            continue  
+            continue
 
         # Save transcript to file
         with open("transcription.txt", "a", encoding="utf-8") as f:
             f.write(transcript + "\n")
 
         print("Press SPACE to record again, or ESC to exit.")
-        
+
         while True:  # Wait for user input
             if keyboard.is_pressed("esc"):
                 print("Exiting...")
                 exit()
             elif keyboard.is_pressed("space"):
-                break  # Restart the loop
\ No newline at end of file
+                break  # Restart the loop
@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import contextbuilder
+
+
+class Summarizer:
+    def __init__(self):
+        self.prompts = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, prompt):
+        self.release.wait(5)
+        self.prompts.append(prompt)
+        return f"summary {len(self.prompts)}"
+
+
+def history(count):
+    return [f"User: message {number}" for number in range(count)]
+
+
+def test_build_never_waits_on_the_summarizer():
+    summarize = Summarizer()
+    builder = contextbuilder.ContextBuilder(summarize, keep_recent=4)
+    turns = history(10)
+
+    text, _ = builder.build(turns, "")
+    assert summarize.prompts == []
+    assert "Summary of earlier conversation" not in text
+    assert "message 0" in text
+
+    assert builder.fold(turns)
+    assert len(summarize.prompts) == 1
+    assert "message 5" in summarize.prompts[0] and "message 6" not in summarize.prompts[0]
+    text, _ = builder.build(turns, "")
+    assert text.startswith("Summary of earlier conversation: summary 1")
+    assert "message 5" not in text and "message 6" in text
+
+
+def test_folds_in_the_background_and_keeps_the_old_summary_meanwhile():
+    summarize = Summarizer()
+    builder = contextbuilder.ContextBuilder(summarize, keep_recent=4)
+    turns = history(10)
+    builder.build(turns, "")
+    builder.fold(turns)
+
+    turns += history(8)
+    builder.build(turns, "")
+    summarize.release.clear()
+    thread = builder.fold_in_background(turns)
+    assert thread is not None
+    assert builder.fold_in_background(turns) is None   # One fold at a time
+
+    text, _ = builder.build(turns, "")
+    assert text.startswith("Summary of earlier conversation: summary 1")
+    summarize.release.set()
+    thread.join(5)
+    text, _ = builder.build(turns, "")
+    assert text.startswith("Summary of earlier conversation: summary 2")
+    assert builder.fold_in_background(turns) is None   # Nothing left to fold
+
+
+def test_summaries_are_cached():
+    summarize = Summarizer()
+    turns = history(10)
+    first = contextbuilder.ContextBuilder(summarize, keep_recent=4)
+    first.build(turns, "")
+    first.fold(turns)
+    first.reset()
+    first.build(turns, "")
+    assert first.fold(turns)
+    assert len(summarize.prompts) == 1
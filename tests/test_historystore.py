@@ -0,0 +1,69 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import historystore
+
+
+def fill(store, count, start_time=1000.0):
+    return [store.append(f"User: message {number}", timestamp=start_time + number) for number in range(count)]
+
+
+def test_append_returns_record_numbers(tmp_path):
+    store = historystore.HistoryStore(str(tmp_path / "history.jsonl"))
+    assert fill(store, 3) == [0, 1, 2]
+    assert len(store) == 3
+    assert store.append({"role": "assistant", "content": "hi"}) == 3
+    assert store.recent(1)[0]["entry"] == {"role": "assistant", "content": "hi"}
+
+
+def test_reopen_reads_the_saved_index(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    fill(historystore.HistoryStore(path), 5)
+    assert os.path.getsize(path + ".idx") == 5 * historystore.INDEX_ENTRY.size
+
+    store = historystore.HistoryStore(path)
+    assert len(store) == 5
+    assert store.append("User: after reopening") == 5
+    assert [record["entry"] for record in store.recent(2)] == ["User: message 4", "User: after reopening"]
+
+
+def test_reopen_indexes_records_missing_from_the_index(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    fill(historystore.HistoryStore(path), 3)
+    with open(path + ".idx", "r+b") as f:
+        f.truncate(historystore.INDEX_ENTRY.size)   # Lost the last two index entries
+    with open(path, "ab") as f:
+        f.write(b'{"ts": 2000, "entry": "User: half wri')   # Crash mid-append
+
+    store = historystore.HistoryStore(path)
+    assert len(store) == 3
+    assert store.append("User: next") == 3
+    assert [record["entry"] for record in store.read_from(2)] == ["User: message 2", "User: next"]
+
+
+def test_seeks_by_record_number_and_time(tmp_path):
+    store = historystore.HistoryStore(str(tmp_path / "history.jsonl"))
+    fill(store, 10)
+    assert [record["entry"] for record in store.read_from(7)] == ["User: message 7", "User: message 8", "User: message 9"]
+    assert [record["entry"] for record in store.read_from(2, limit=2)] == ["User: message 2", "User: message 3"]
+    assert store.read_from(10) == []
+    assert [record["ts"] for record in store.recent(3)] == [1007.0, 1008.0, 1009.0]
+    assert [record["ts"] for record in store.between(1003, 1005)] == [1003.0, 1004.0, 1005.0]
+    assert len(store.between(1008)) == 2
+    assert historystore.format_records(store.read_from(8)) == "User: message 8\nUser: message 9"
+
+
+def test_marks_persist_across_instances(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    store = historystore.HistoryStore(path)
+    assert store.get_mark("memory") == 0
+    store.set_mark("memory", 4)
+    store.set_mark("index", 2)
+    store.set_mark("memory", 6)
+
+    reopened = historystore.HistoryStore(path)
+    assert reopened.get_mark("memory") == 6
+    assert reopened.get_mark("index") == 2
+    assert reopened.get_mark("unknown") == 0
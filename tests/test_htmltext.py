@@ -0,0 +1,22 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import htmltext
+
+
+def test_body_is_kept_when_head_is_not_closed():
+    html = "<html><head><title>T</title><meta charset=utf-8><body><p>Hello world</p><p>More</p>"
+    assert htmltext.extract_text(html) == "T\nHello world\nMore"
+
+
+def test_body_is_kept_without_head_or_body_end_tags():
+    html = "<html><head><title>T</title><link rel=stylesheet href=a.css><p>Hello world</p>"
+    assert htmltext.extract_text(html) == "T\nHello world"
+
+
+def test_head_scripts_and_styles_are_skipped():
+    html = ("<html><head><title>T</title><script>var x = 1</script><style>p {}</style></head>"
+            "<body><p>Hi</p><script>track()</script></body></html>")
+    assert htmltext.extract_text(html) == "T\nHi"
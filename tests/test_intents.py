@@ -0,0 +1,91 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import intents
+
+
+@pytest.fixture
+def router():
+    """A router with the assistant's built-in intents (see speech25) plus a regex one."""
+    router = intents.IntentRouter()
+    noop = lambda text, argument: None
+    router.register("exit", noop, ["exit", "quit", "goodbye"], fuzzy=False)
+    router.register("stop", noop, ["stop", "stop talking", "be quiet"], fuzzy=False)
+    router.register("help", noop, ["show help", "help"])
+    router.register("time", noop, ["what's the time", "what time is it", "tell me the time", "what is the time"])
+    router.register("date", noop, ["what's the date", "what date is it", "what is the date", "what's today's date"])
+    router.register("find", noop, ["find file", "find the file", "search for file", "where is the file"], takes_args=True)
+    router.register("timer", noop, patterns=[r"set a timer for (\d+) minutes?"])
+    return router
+
+
+def matched(router, text):
+    found = router.match(text)
+    return found[0].name if found else None
+
+
+@pytest.mark.parametrize("text, name", [
+    ("What's the time?", "time"),
+    ("what date is it", "date"),
+    ("Goodbye!", "exit"),
+    ("be quiet", "stop"),
+])
+def test_exact_phrases(router, text, name):
+    intent, argument, score = router.match(text)
+    assert (intent.name, argument, score) == (name, "", 1.0)
+
+
+def test_phrase_with_argument_keeps_its_original_case(router):
+    intent, argument, _ = router.match("Find the file Report.TXT")
+    assert intent.name == "find"
+    assert argument == "Report.TXT"
+
+
+def test_regex_pattern(router):
+    intent, found, _ = router.match("Set a timer for 10 minutes")
+    assert intent.name == "timer"
+    assert found.group(1) == "10"
+
+
+@pytest.mark.parametrize("text, name", [
+    ("wat time is it", "time"),
+    ("whats the tme", "time"),
+    ("show hellp", "help"),
+])
+def test_fuzzy_matches_typos(router, text, name):
+    intent, _, score = router.match(text)
+    assert intent.name == name
+    assert router.fuzzy_cutoff <= score < 1.0
+
+
+@pytest.mark.parametrize("text", [
+    "quiet",
+    "quite",
+    "quitt",
+    "stopp talking",
+    "what time is it in tokyo",
+    "what's the date of easter",
+    "where is the eiffel tower",
+    "find me a good restaurant",
+    "search for flights to paris",
+    "tell me a joke",
+    "",
+])
+def test_false_positives_go_to_the_llm(router, text):
+    assert router.match(text) is None
+
+
+def test_what_date_is_it_is_not_the_time(router):
+    # One word apart from "what time is it", but it must never answer with the time
+    assert matched(router, "what date is it") == "date"
+    assert matched(router, "what dat is it") == "date"
+
+
+def test_handler_may_decline(router):
+    router.register("lights", lambda text, argument: False, ["turn off the lights"])
+    assert router.handle("turn off the lights") is None
+    assert router.handle("what time is it") == "time"
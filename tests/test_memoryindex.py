@@ -0,0 +1,81 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("requests")
+
+import memoryindex
+
+
+class Reply:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class SlowEmbeddings:
+    """Client stand-in whose embeddings take a moment, so concurrent callers overlap."""
+
+    def post(self, endpoint, json=None, **kwargs):
+        time.sleep(0.005)
+        digest = hashlib.sha256(json["prompt"].encode("utf-8")).digest()
+        return Reply({"embedding": [byte - 128 for byte in digest]})
+
+
+def test_concurrent_sync_stores_each_chunk_once(tmp_path):
+    index = memoryindex.MemoryIndex(str(tmp_path / "memory_index"), client=SlowEmbeddings())
+    text = "\n\n".join(f"Fact number {i}: " + "detail " * 100 for i in range(20))
+    expected = len(memoryindex.chunk_text(text))
+
+    threads = [threading.Thread(target=index.sync, args=("memory.txt", text)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(index.chunks) == expected
+    assert len(index.vectors) == expected
+    texts = [text for _, text, _ in index.search("Fact number 3", k=6)]
+    assert len(set(texts)) == len(texts) == 6
+
+
+class CountingEmbeddings(SlowEmbeddings):
+    def __init__(self):
+        self.prompts = []
+
+    def post(self, endpoint, json=None, **kwargs):
+        self.prompts.append(json["prompt"])
+        return super().post(endpoint, json=json, **kwargs)
+
+
+def test_unchanged_chunks_are_not_embedded_again(tmp_path):
+    path = str(tmp_path / "memory_index")
+    client = CountingEmbeddings()
+    index = memoryindex.MemoryIndex(path, client=client)
+    paragraphs = [f"Fact number {i}: " + "detail " * 100 for i in range(5)]
+    text = "\n\n".join(paragraphs)
+    chunks = memoryindex.chunk_text(text)
+    index.sync("memory.txt", text)
+    assert len(client.prompts) == len(chunks)
+
+    index.sync("memory.txt", text)
+    assert len(client.prompts) == len(chunks)
+
+    paragraphs[2] = "Fact number 2 was corrected."
+    edited = memoryindex.chunk_text("\n\n".join(paragraphs))
+    index.sync("memory.txt", "\n\n".join(paragraphs))
+    assert client.prompts[len(chunks):] == [chunk for chunk in edited if chunk not in chunks]
+    index.save()
+
+    reopened = memoryindex.MemoryIndex(path, client=client)
+    reopened.sync("memory.txt", "\n\n".join(paragraphs))
+    assert len(client.prompts) == len(chunks) + 1
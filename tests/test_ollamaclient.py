@@ -0,0 +1,125 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, ".."))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "benchmarks"))
+
+pytest.importorskip("requests")
+
+import ollamaclient
+import stub_ollama
+
+
+@pytest.fixture
+def stub():
+    # Each non-streamed generate takes about 0.5s
+    server = stub_ollama.StubOllama(token_ms=25, reply_tokens=20).start()
+    yield server
+    server.stop()
+
+
+def generate(pool, role, stream=False):
+    data = {"model": stub_ollama.MODEL, "prompt": "Summarize the conversation.", "stream": stream}
+    return pool.post("generate", json=data, stream=stream, role=role)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_background_work_leaves_a_slot_for_interactive_requests(stub):
+    pool = ollamaclient.BackendPool([stub.url], max_concurrent=4, background_max_wait=60)
+    backend = pool.backends[0]
+    summaries = [threading.Thread(target=generate, args=(pool, ollamaclient.BACKGROUND)) for _ in range(4)]
+    for thread in summaries:
+        thread.start()
+    wait_for(lambda: backend.background == 3)
+    time.sleep(0.05)
+    assert backend.background == 3   # The fourth summary waits rather than take the last slot
+
+    generate(pool, ollamaclient.INTERACTIVE)
+    assert pool.waits[ollamaclient.INTERACTIVE][-1] < 0.1
+    for thread in summaries:
+        thread.join()
+    assert backend.outstanding == 0
+    assert pool.queue_stats()[ollamaclient.BACKGROUND]["count"] == 4
+
+
+def test_background_request_stops_yielding_after_max_wait(stub):
+    pool = ollamaclient.BackendPool([stub.url], max_concurrent=4, background_max_wait=0.3)
+    reply = generate(pool, ollamaclient.INTERACTIVE, stream=True)   # Held open: the user's turn is running
+    try:
+        start = time.perf_counter()
+        generate(pool, ollamaclient.BACKGROUND)
+        waited = pool.waits[ollamaclient.BACKGROUND][-1]
+        assert 0.3 <= waited < time.perf_counter() - start
+        assert pool.deferred == 1
+    finally:
+        reply.close()
+    assert pool.backends[0].outstanding == 0
+
+
+def test_single_slot_server_still_runs_background_work(stub):
+    pool = ollamaclient.BackendPool([stub.url], max_concurrent=1)
+    generate(pool, ollamaclient.BACKGROUND)
+    assert pool.deferred == 0
+
+
+def dead_url():
+    """URL of a port nothing listens on, so connections are refused at once."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/api"
+
+
+def test_health_check_skips_a_down_server(stub):
+    pool = ollamaclient.BackendPool([dead_url(), stub.url], retries=0)
+    assert pool.check() == 1
+    assert generate(pool, ollamaclient.INTERACTIVE).json()["done"]
+    assert pool.failovers == 0
+    assert pool.backends[0].client.stats() == {}
+
+
+def test_fails_over_to_the_next_server(stub):
+    pool = ollamaclient.BackendPool([dead_url(), stub.url, dead_url()], retries=0)
+    assert generate(pool, ollamaclient.INTERACTIVE).json()["done"]
+    assert pool.failovers == 1
+    assert not pool.backends[0].healthy and pool.backends[1].healthy
+    assert all(backend.outstanding == 0 for backend in pool.backends)
+
+
+def test_routes_requests_to_a_server_with_the_model():
+    llama = stub_ollama.StubOllama(models=("llama3:latest",), token_ms=0).start()
+    mistral = stub_ollama.StubOllama(models=("mistral:latest",), token_ms=0).start()
+    try:
+        pool = ollamaclient.BackendPool([llama.url, mistral.url], retries=0)
+        pool.check()
+        for _ in range(3):
+            pool.post("generate", json={"model": "mistral", "prompt": "hi", "stream": False})
+        assert mistral.counts.get("generate") == 3
+        assert "generate" not in llama.counts
+        assert pool.list_models() == ["llama3:latest", "mistral:latest"]
+    finally:
+        llama.stop()
+        mistral.stop()
+
+
+def test_stream_holds_its_slot_until_closed(stub):
+    pool = ollamaclient.BackendPool([stub.url], retries=0)
+    backend = pool.backends[0]
+    reply = generate(pool, ollamaclient.INTERACTIVE, stream=True)
+    next(reply.iter_lines())
+    assert backend.outstanding == 1
+    reply.close()
+    reply.close()   # Closing twice releases the slot once
+    assert backend.outstanding == 0
@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pipeline
+
+
+def test_failed_stage_skips_later_stages_but_not_always_ones():
+    seen = []
+
+    def generate(job):
+        raise RuntimeError("Ollama went away")
+
+    def execute(job):
+        seen.append(("execute", job["response"]))
+
+    def persist(job):
+        seen.append(("persist", job.error))
+
+    turns = pipeline.Pipeline([
+        pipeline.Stage("generate", generate),
+        pipeline.Stage("execute", execute),
+        pipeline.Stage("persist", persist, always=True),
+    ]).start()
+    job = turns.submit(pipeline.Job(prompt="hello"))
+    assert turns.wait(5)
+    turns.stop(5)
+
+    assert [name for name, _ in seen] == ["persist"]
+    assert isinstance(job.error, RuntimeError)
+    assert str(job.error) == "Ollama went away"
+    assert "execute" not in job.timings
@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import responsecache
+
+
+def test_key_ignores_streaming_options():
+    request = {"model": "llama3", "prompt": "What is a tuple?", "options": {"temperature": 0}}
+    key = responsecache.cache_key(request)
+    assert responsecache.cache_key(dict(request, stream=True, keep_alive="5m")) == key
+    assert responsecache.cache_key(dict(request, prompt="What is a list?")) != key
+
+
+def test_entries_expire_after_their_ttl(tmp_path):
+    cache = responsecache.ResponseCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    cache.put("short", "gone soon", ttl=0.05)
+    cache.put("long", "still here")
+    assert cache.get("short") == "gone soon"
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    assert "short" not in cache.memory
+    assert cache.get("long") == "still here"
+    assert cache.stats["misses"] == 1
+
+
+def test_memory_tier_evicts_the_least_recently_used(tmp_path):
+    cache = responsecache.ResponseCache(str(tmp_path / "cache.sqlite3"), memory_entries=2)
+    cache.put("a", "first")
+    cache.put("b", "second")
+    assert cache.get("a") == "first"   # b is now the least recently used
+    cache.put("c", "third")
+    assert list(cache.memory) == ["a", "c"]
+
+    assert cache.get("b") == "second"   # Still on disk
+    assert cache.stats["disk_hits"] == 1
+    assert list(cache.memory) == ["c", "b"]
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = responsecache.ResponseCache(path)
+    first.put("kept", "from the last session")
+    first.put("expired", "too old", ttl=-1)
+    first.db.close()
+
+    second = responsecache.ResponseCache(path)
+    assert second.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 1   # Expired rows pruned at startup
+    assert second.get("kept") == "from the last session"
+    assert second.get("expired") is None
+    assert second.stats == {"memory_hits": 0, "disk_hits": 1, "misses": 1, "stores": 0}
+    assert second.get("kept") == "from the last session"
+    assert second.stats["memory_hits"] == 1
+    assert second.hit_rate() == 2 / 3
+
+
+def test_falls_back_to_memory_when_the_database_cannot_open(tmp_path):
+    cache = responsecache.ResponseCache(str(tmp_path / "missing" / "cache.sqlite3"))
+    assert cache.db is None
+    cache.put("key", "text")
+    assert cache.get("key") == "text"
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, ".."))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "benchmarks"))
+
+pytest.importorskip("requests")
+pytest.importorskip("numpy")
+
+import ollamaclient
+import replies
+import session
+import stub_ollama
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = stub_ollama.StubOllama(token_ms=0, reply_tokens=24).start()
+    monkeypatch.setattr(ollamaclient, "client", ollamaclient.BackendPool([server.url], retries=0))
+    yield server
+    server.stop()
+
+
+def test_turn_streams_sentences_and_keeps_history(stub, tmp_path):
+    client_session = session.Session("alice", stub_ollama.MODEL, str(tmp_path))
+    spoken = []
+    reply = client_session.respond("hello there", on_sentence=spoken.append)
+    assert reply.startswith("This is a canned reply")
+    assert spoken[0] == "This is a canned reply from the stub server."
+    assert [turn.role for turn in client_session.history[:]] == ["user", "assistant"]
+    assert len(client_session.history_store) == 2
+
+
+def test_unreachable_ollama_gives_the_error_reply(monkeypatch, tmp_path):
+    monkeypatch.setattr(ollamaclient, "client", ollamaclient.BackendPool(["http://127.0.0.1:9/api"], retries=0))
+    client_session = session.Session("bob", stub_ollama.MODEL, str(tmp_path))
+    assert client_session.generate("hello") == replies.OLLAMA_ERROR
+
+
+def test_memory_is_refined_per_session(stub, tmp_path):
+    alice = session.Session("alice", stub_ollama.MODEL, str(tmp_path))
+    bob = session.Session("bob", stub_ollama.MODEL, str(tmp_path))
+    alice.memory_refiner.batch_size = 4
+    for number in range(2):
+        alice.respond(f"remember number {number}")
+    alice.refine_thread.join(5)
+    assert "canned reply" in alice.load_memory()
+    assert bob.load_memory() == ""
+    assert not os.path.exists(bob.memory_path)
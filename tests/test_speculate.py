@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import speculate
+
+
+class Prefill:
+    """Stands in for the open prefill response; it stays open until the speculator closes it."""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def iter_lines(self):
+        self.closed.wait(5)
+        return iter(())
+
+    def close(self):
+        self.closed.set()
+
+
+class Harness:
+    def __init__(self):
+        self.version = 0
+        self.prefills = []
+        self.speculator = speculate.Speculator(self.build, self.prefill, version=lambda: self.version,
+                                               stable_seconds=0.01)
+
+    def build(self, text):
+        return f"context for {text}"
+
+    def prefill(self, context, text):
+        self.prefills.append(Prefill())
+        return self.prefills[-1]
+
+    def hear(self, partial):
+        """Feeds one partial transcript and waits until its prefill is running."""
+        count = len(self.prefills)
+        self.speculator.begin()
+        self.speculator.on_partial(partial)
+        deadline = time.monotonic() + 5
+        while len(self.prefills) == count:
+            assert time.monotonic() < deadline, "no speculation started"
+            time.sleep(0.01)
+        return self.prefills[-1]
+
+
+def test_hit_reuses_the_context():
+    harness = Harness()
+    prefill = harness.hear("What is the weather in")
+    context = harness.speculator.commit("what is the weather in Paris")
+    assert context == "context for What is the weather in"   # 5 of 6 final words seen
+    assert harness.speculator.stats["hits"] == 1
+    assert not prefill.closed.is_set()   # The warm prompt cache is what the turn reuses
+    prefill.close()
+
+
+def test_miss_below_the_coverage_threshold_cancels_the_prefill():
+    harness = Harness()
+    prefill = harness.hear("What is the weather")
+    assert harness.speculator.commit("what is the weather in Paris today") is None   # 4 of 7 words
+    assert prefill.closed.is_set()
+    assert harness.speculator.stats["misses"] == 1
+
+
+def test_miss_when_the_final_transcript_diverges():
+    harness = Harness()
+    prefill = harness.hear("What is the weather in")
+    assert harness.speculator.commit("what was the weather in Paris") is None
+    assert prefill.closed.is_set()
+
+
+def test_miss_when_the_history_changed_meanwhile():
+    harness = Harness()
+    prefill = harness.hear("What is the weather in")
+    harness.version += 1   # A background fold or memory update landed after the context was built
+    assert harness.speculator.commit("what is the weather in Paris") is None
+    assert prefill.closed.is_set()
+    assert harness.speculator.hit_rate() == 0.0
+
+
+def test_commit_without_a_speculation():
+    harness = Harness()
+    harness.speculator.begin()
+    harness.speculator.on_partial("Hi")   # Too short to speculate on
+    assert harness.speculator.commit("hi") is None
+    assert harness.prefills == []
+    assert harness.speculator.stats == {"speculated": 0, "hits": 0, "misses": 0, "unused": 0}
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+for module in ("requests", "numpy", "pyttsx3", "keyboard", "pyaudio", "speech_recognition"):
+    pytest.importorskip(module)
+
+PROBE = """
+import subprocess, sys
+sys.path.insert(0, {repo!r})
+def refuse(*args, **kwargs):
+    raise AssertionError("importing speech25 installed packages or hooked the keyboard: %r" % (args,))
+subprocess.run = refuse
+import keyboard
+keyboard.on_press_key = keyboard.on_press = refuse
+import speech25
+assert speech25.tts.thread is None and speech25.tts.hook is None
+print("ok")
+"""
+
+
+def test_import_has_no_install_or_tts_side_effects(tmp_path):
+    # A fresh interpreter, so the module really is imported; it writes its history under tmp_path
+    env = dict(os.environ, TRACE_FILE="", OLLAMA_URL="http://127.0.0.1:9/api")
+    result = subprocess.run([sys.executable, "-c", PROBE.format(repo=os.path.abspath(REPO_DIR))],
+                            cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().endswith("ok")
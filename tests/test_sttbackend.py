@@ -0,0 +1,54 @@
+import math
+import os
+import sys
+from array import array
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+sr = pytest.importorskip("speech_recognition")
+
+import sttbackend
+from test_vad import RATE, samples
+
+
+def quiet_speech(ms):
+    """A tone well below the energy detector's threshold, like speech far from the microphone."""
+    count = RATE * ms // 1000
+    return array("h", (int(150 * math.sin(2 * math.pi * 220 * i / RATE)) for i in range(count))).tobytes()
+
+
+@pytest.fixture
+def google(monkeypatch):
+    backend = sttbackend.GoogleBackend()
+    uploads = []
+
+    def recognize_google(audio_data, language=None):
+        uploads.append(audio_data.get_raw_data())
+        return "hello there"
+
+    monkeypatch.setattr(backend.recognizer, "recognize_google", recognize_google)
+    return backend, uploads
+
+
+def test_google_uploads_only_the_speech(google):
+    backend, uploads = google
+    pcm = samples("silence", 1000) + samples("speech", 500) + samples("silence", 1000)
+    assert backend.transcribe(sr.AudioData(pcm.tobytes(), RATE, sttbackend.SAMPLE_WIDTH)) == "hello there"
+    assert len(uploads[0]) < len(pcm.tobytes()) // 2
+
+
+def test_google_sends_quiet_speech_untrimmed(google):
+    backend, uploads = google
+    pcm = quiet_speech(800)
+    assert backend.transcribe(sr.AudioData(pcm, RATE, sttbackend.SAMPLE_WIDTH)) == "hello there"
+    assert uploads == [pcm]
+
+
+def test_google_rejects_an_empty_recording(google):
+    backend, uploads = google
+    backend.start(RATE)
+    with pytest.raises(sr.UnknownValueError):
+        backend.finish()
+    assert uploads == []
@@ -0,0 +1,92 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+pytest.importorskip("pyaudio")
+pytest.importorskip("keyboard")
+sr = pytest.importorskip("speech_recognition")
+
+import talkmod
+from test_vad import RATE, samples
+
+
+class FakeStream:
+    """Microphone stand-in that plays back a list of (kind, milliseconds) segments, then silence."""
+
+    def __init__(self, segments):
+        self.data = b"".join(samples(kind, ms).tobytes() for kind, ms in segments)
+        self.position = 0
+
+    def read(self, frames, exception_on_overflow=False):
+        size = frames * talkmod.SAMPLE_WIDTH
+        chunk = self.data[self.position:self.position + size]
+        self.position += size
+        return chunk + bytes(size - len(chunk))
+
+    def start_stream(self):
+        pass
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeSTT:
+    """Recognizer that cannot understand the first utterances and then returns fixed text."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.utterances = []
+
+    def start(self, rate):
+        self.audio = b""
+
+    def feed(self, chunk):
+        self.audio += chunk
+        return None
+
+    def finish(self):
+        self.utterances.append(len(self.audio))
+        if len(self.utterances) <= self.failures:
+            raise sr.UnknownValueError()
+        return "hello there"
+
+
+@pytest.fixture
+def microphone(monkeypatch):
+    def install(segments, failures=0):
+        capture = talkmod.AudioCapture(rate=RATE, max_seconds=1, stream=FakeStream(segments))
+        stt = FakeSTT(failures)
+        monkeypatch.setattr(talkmod, "capture", capture)
+        monkeypatch.setattr(talkmod, "stt", stt)
+        return capture, stt
+    return install
+
+
+def test_long_silence_does_not_fill_the_buffer(microphone):
+    # Three seconds of quiet before speaking, with a buffer that only holds one second
+    capture, stt = microphone([("silence", 3000), ("speech", 600), ("silence", 1500)])
+    assert talkmod.listen_and_transcribe() == "hello there"
+    assert capture.length == 0
+    assert len(stt.utterances) == 1
+
+
+def test_unintelligible_noise_keeps_listening(microphone):
+    capture, stt = microphone([("speech", 300), ("silence", 1500), ("speech", 600), ("silence", 1500)], failures=1)
+    assert talkmod.listen_and_transcribe() == "hello there"
+    assert len(stt.utterances) == 2
+
+
+def test_assistant_voice_is_not_taken_for_the_user(microphone):
+    # The first second is the assistant's reply coming back from the speakers
+    capture, stt = microphone([("speech", 1000), ("silence", 1500), ("speech", 400), ("silence", 1500)])
+    playback = capture.rate * talkmod.SAMPLE_WIDTH   # Bytes of audio while the assistant talks
+    assert talkmod.listen_and_transcribe(is_speaking=lambda: capture.stream.position <= playback) == "hello there"
+    assert len(stt.utterances) == 1
+    spoken_ms = stt.utterances[0] * 1000 // (RATE * talkmod.SAMPLE_WIDTH)
+    assert spoken_ms < 400 + 400   # Only the user's own words, plus a little padding
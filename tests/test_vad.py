@@ -0,0 +1,93 @@
+import math
+import os
+import random
+import sys
+import wave
+from array import array
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import vad
+
+RATE = 16000
+
+
+def samples(kind, ms, rate=RATE):
+    """16-bit PCM for one segment of a synthetic recording: "speech" (a loud tone), "silence" or "noise"."""
+    count = rate * ms // 1000
+    rng = random.Random(ms)
+    if kind == "speech":
+        return array("h", (int(8000 * math.sin(2 * math.pi * 220 * i / rate)) for i in range(count)))
+    if kind == "noise":
+        return array("h", (rng.randint(-60, 60) for _ in range(count)))
+    return array("h", bytes(2 * count))
+
+
+def write_wav(path, segments, rate=RATE):
+    """Writes a mono 16-bit WAV fixture made of (kind, milliseconds) segments."""
+    pcm = array("h")
+    for kind, ms in segments:
+        pcm.extend(samples(kind, ms, rate))
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(vad.SAMPLE_WIDTH)
+        f.setframerate(rate)
+        f.writeframes(pcm.tobytes())
+    return path
+
+
+def read_wav(path):
+    with wave.open(str(path), "rb") as f:
+        return f.readframes(f.getnframes()), f.getframerate()
+
+
+def ms_of(pcm, rate=RATE):
+    return len(pcm) * 1000 // (rate * vad.SAMPLE_WIDTH)
+
+
+@pytest.fixture
+def utterance(tmp_path):
+    """One second of silence, a second of speech with a short gap in it, then two seconds of quiet."""
+    return write_wav(tmp_path / "utterance.wav", [
+        ("silence", 1000), ("speech", 500), ("noise", 200), ("speech", 500), ("silence", 2000)])
+
+
+def feed(endpointer, pcm, chunk=2048):
+    out = []
+    for start in range(0, len(pcm), chunk):
+        out.append(endpointer.process(pcm[start:start + chunk]))
+        if endpointer.done:
+            break
+    return b"".join(out)
+
+
+def test_endpointer_trims_leading_silence_and_ends_after_pause(utterance):
+    pcm, rate = read_wav(utterance)
+    endpointer = vad.Endpointer(rate, detector=vad.EnergyVAD(rate), end_silence_ms=600)
+    speech = feed(endpointer, pcm)
+    assert endpointer.done
+    # The speech and the gap inside it are kept, plus at most the padding before it
+    assert 1200 <= ms_of(speech) <= 1200 + vad.PADDING_MS + vad.FRAME_MS
+
+
+def test_endpointer_keeps_a_pause_shorter_than_the_end_silence(utterance):
+    pcm, rate = read_wav(utterance)
+    endpointer = vad.Endpointer(rate, detector=vad.EnergyVAD(rate), end_silence_ms=600, padding_ms=0)
+    speech = feed(endpointer, pcm)
+    assert ms_of(speech) >= 1200 - vad.FRAME_MS * vad.START_FRAMES
+
+
+def test_endpointer_passes_nothing_for_silence(tmp_path):
+    pcm, rate = read_wav(write_wav(tmp_path / "quiet.wav", [("silence", 1500), ("noise", 1500)]))
+    endpointer = vad.Endpointer(rate, detector=vad.EnergyVAD(rate))
+    assert feed(endpointer, pcm) == b""
+    assert not endpointer.triggered and not endpointer.done
+
+
+def test_trim_silence_removes_both_ends(utterance):
+    pcm, rate = read_wav(utterance)
+    trimmed = vad.trim_silence(pcm, rate, detector=vad.EnergyVAD(rate))
+    assert 1200 <= ms_of(trimmed) <= 1200 + vad.PADDING_MS + vad.FRAME_MS
+    assert ms_of(trimmed) < ms_of(pcm) - 2000
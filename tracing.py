@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Where spans are written: a .json path gives a Chrome trace (open it in chrome://tracing or
+# Perfetto), anything else JSON Lines. Set TRACE_FILE to an empty string to keep spans in memory only.
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+MAX_SAMPLES = 1000     # Durations kept per span name for the p50/p95 summary
+
+_local = threading.local()
+
+
+def current_turn():
+    """Returns the turn the calling thread is working on, or None."""
+    return getattr(_local, "turn", None)
+
+
+def set_turn(turn):
+    _local.turn = turn
+
+
+def bind(func):
+    """Wraps func so it runs under the caller's turn, for work handed to a thread pool."""
+    turn = current_turn()
+
+    def bound(*args, **kwargs):
+        previous = current_turn()
+        set_turn(turn)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            set_turn(previous)
+    return bound
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+class Tracer:
+    """Records timed spans for each stage of a turn and writes them to a trace file.
+
+    Spans are tagged with the turn they belong to (set per thread with set_turn() or the turn
+    argument of span()), so one turn can be followed across the pipeline, fetch, command and
+    TTS threads. Every span also feeds an in-memory p50/p95 summary.
+    """
+
+    def __init__(self, path=TRACE_FILE):
+        self.path = path
+        self.chrome = bool(path) and path.endswith(".json")
+        self.origin = time.perf_counter()
+        self.wall_origin = time.time()
+        self.lock = threading.Lock()
+        self.samples = {}      # span name -> recent durations in seconds
+        self.file = None
+
+    def _open(self):
+        if self.file is None and self.path:
+            try:
+                # JSON Lines accumulate across runs; a Chrome trace holds one run
+                self.file = open(self.path, "w" if self.chrome else "a", encoding="utf-8")
+                if self.chrome:
+                    self.file.write("[\n")   # Chrome accepts the array without its closing bracket
+            except OSError as e:
+                print(f"Tracing to {self.path} disabled: {e}")
+                self.path = None
+        return self.file
+
+    def add(self, name, start, duration, turn=None, **args):
+        """Records a span that started at perf_counter() time start and lasted duration seconds."""
+        turn = current_turn() if turn is None else turn
+        with self.lock:
+            self.samples.setdefault(name, deque(maxlen=MAX_SAMPLES)).append(duration)
+            out = self._open()
+            if out is None:
+                return
+            if self.chrome:
+                args = dict(args, turn=turn) if turn is not None else args
+                event = {"name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                         "ts": round((start - self.origin) * 1e6), "dur": round(duration * 1e6), "args": args}
+                out.write(json.dumps(event, default=str) + ",\n")
+            else:
+                record = {"name": name, "turn": turn, "start": round(self.wall_origin + start - self.origin, 6),
+                          "ms": round(duration * 1000, 3), "thread": threading.current_thread().name}
+                if args:
+                    record["args"] = args
+                out.write(json.dumps(record, default=str) + "\n")
+
+    @contextmanager
+    def span(self, name, turn=None, **args):
+        """Times the with-block as one span. Passing turn also sets it for spans nested inside."""
+        previous = current_turn()
+        if turn is not None:
+            set_turn(turn)
+        start = time.perf_counter()
+        try:
+            yield args    # The block may add fields, e.g. sizes known only at the end
+        finally:
+            self.add(name, start, time.perf_counter() - start, **args)
+            set_turn(previous)
+
+    def record_ollama(self, reply, end=None):
+        """Adds load, prefill and generation spans from the durations in a finished Ollama reply.
+
+        Ollama reports them in nanoseconds and runs them back to back, so they are laid out
+        ending at end (when the reply arrived).
+        """
+        end = time.perf_counter() if end is None else end
+        total = reply.get("total_duration")
+        if not total:
+            return
+        start = end - total / 1e9
+        for name, key, count in (("ollama_load", "load_duration", None),
+                                 ("ollama_prefill", "prompt_eval_duration", "prompt_eval_count"),
+                                 ("ollama_eval", "eval_duration", "eval_count")):
+            duration = reply.get(key)
+            if not duration:
+                continue
+            args = {"tokens": reply[count]} if count and reply.get(count) is not None else {}
+            self.add(name, start, duration / 1e9, **args)
+            start += duration / 1e9
+
+    def summary(self):
+        """Returns {span name: {count, p50_ms, p95_ms, max_ms}}."""
+        with self.lock:
+            result = {}
+            for name, durations in self.samples.items():
+                ordered = sorted(durations)
+                result[name] = {
+                    "count": len(ordered),
+                    "p50_ms": round(1000 * percentile(ordered, 0.5), 1),
+                    "p95_ms": round(1000 * percentile(ordered, 0.95), 1),
+                    "max_ms": round(1000 * ordered[-1], 1),
+                }
+            return result
+
+    def print_summary(self):
+        """Prints p50/p95 per stage, slowest first."""
+        stats = sorted(self.summary().items(), key=lambda item: -item[1]["p95_ms"])
+        for name, entry in stats:
+            print(f"Trace {name}: n={entry['count']} p50={entry['p50_ms']}ms "
+                  f"p95={entry['p95_ms']}ms max={entry['max_ms']}ms")
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+# Shared tracer used across the project.
+tracer = Tracer()
+span = tracer.span
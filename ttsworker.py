@@ -0,0 +1,166 @@
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+
+import keyboard
+import pyttsx3
+
+import tracing
+
+# Utterance priorities; lower numbers are spoken first.
+URGENT = 0     # Greetings, goodbyes, short system notices
+NORMAL = 1     # Replies to the user
+LOW = 2        # Web summaries and other background chatter
+
+NOTHING = object()   # No turn has been cancelled
+
+
+class TTSWorker:
+    """One long-lived thread that owns the pyttsx3 engine and speaks queued utterances in order.
+
+    Nothing else touches the engine, so overlapping replies queue up instead of failing with
+    "run loop already started". cancel() (or setting stop_flag) drops everything queued and
+    stops the current sentence. Later sentences of the cancelled turn are dropped too, so a reply
+    that is still streaming cannot start talking over the user again.
+    """
+
+    def __init__(self, stop_flag=None, rate=150, volume=0.7, barge_in_key="space"):
+        self.stop_flag = stop_flag or threading.Event()
+        self.rate = rate
+        self.volume = volume
+        self.barge_in_key = barge_in_key
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()           # Keeps equal priorities first-in, first-out
+        self.generation = 0                      # Bumped on cancel; older utterances are skipped
+        self.engine = None
+        self.speaking = threading.Event()
+        self.idle = threading.Condition()
+        self.pending = 0                         # Utterances queued or being spoken
+        self.ready = threading.Event()
+        self.thread = None
+        self.hook = None
+        self.current_enqueued = None
+        self.current_turn = None
+        self.time_to_speak = deque(maxlen=200)   # Seconds from say() to the audio starting
+        self.cancellations = 0
+        self.lock = threading.Lock()
+        self.last_turn = None                    # Turn of the most recent say()
+        self.cancelled_turn = NOTHING            # Turn whose remaining speech is dropped
+
+    def start(self):
+        """Starts the worker thread and the barge-in key listener."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="tts", daemon=True)
+            self.thread.start()
+        if self.hook is None and self.barge_in_key:
+            # Only our own hook is ever removed, other keyboard listeners stay in place
+            self.hook = keyboard.on_press_key(self.barge_in_key, lambda event: self._barge_in())
+        return self
+
+    def say(self, text, priority=NORMAL):
+        """Queues text to be spoken.
+
+        Text from a new turn clears an earlier stop request; text from the turn that was
+        cancelled is dropped.
+        """
+        if not text or not text.strip():
+            return
+        turn = tracing.current_turn()
+        with self.lock:
+            if turn == self.cancelled_turn:
+                return
+            self.cancelled_turn = NOTHING
+            self.last_turn = turn
+            self.stop_flag.clear()
+        with self.idle:
+            self.pending += 1
+        self.queue.put((priority, next(self.order), time.perf_counter(), self.generation, text, turn))
+
+    def cancel(self):
+        """Drops queued utterances, stops the one being spoken and mutes the rest of its turn."""
+        with self.lock:
+            self.cancelled_turn = self.last_turn
+            self.stop_flag.set()
+        self.generation += 1
+        self.cancellations += 1
+        dropped = 0
+        try:
+            while True:
+                self.queue.get_nowait()
+                dropped += 1
+        except queue.Empty:
+            pass
+        self._done(dropped)
+        if self.engine is not None and self.speaking.is_set():
+            self.engine.stop()
+
+    def wait(self, timeout=None):
+        """Waits until everything queued has been spoken. Returns False on timeout."""
+        with self.idle:
+            return self.idle.wait_for(lambda: self.pending == 0, timeout)
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    def stats(self):
+        """Returns queue depth, cancellations and time-to-speak figures in milliseconds."""
+        samples = sorted(self.time_to_speak)
+        result = {"queue_depth": self.depth, "cancellations": self.cancellations, "spoken": len(samples)}
+        if samples:
+            result["time_to_speak_p50_ms"] = round(1000 * samples[len(samples) // 2], 1)
+            result["time_to_speak_max_ms"] = round(1000 * samples[-1], 1)
+        return result
+
+    def close(self):
+        if self.hook is not None:
+            keyboard.unhook(self.hook)
+            self.hook = None
+
+    def _barge_in(self):
+        if self.pending:
+            self.cancel()
+
+    def _on_word(self, name, location, length):
+        # Runs inside the engine loop, so a flag set from anywhere stops speech within a word
+        if self.stop_flag.is_set():
+            self.engine.stop()
+
+    def _on_start(self, name):
+        if self.current_enqueued is not None:
+            waited = time.perf_counter() - self.current_enqueued
+            self.time_to_speak.append(waited)
+            tracing.tracer.add("tts_start", self.current_enqueued, waited, turn=self.current_turn)
+            self.current_enqueued = None
+
+    def _run(self):
+        self.engine = pyttsx3.init()
+        self.engine.setProperty('rate', self.rate)  # Speech rate
+        self.engine.setProperty('volume', self.volume)  # Volume level
+        self.engine.connect('started-utterance', self._on_start)
+        self.engine.connect('started-word', self._on_word)
+        self.ready.set()
+
+        while True:
+            priority, _, enqueued, generation, text, turn = self.queue.get()
+            if generation != self.generation or self.stop_flag.is_set():
+                self._done(1)
+                continue   # Cancelled while waiting in the queue
+            self.current_enqueued = enqueued
+            self.current_turn = turn
+            self.speaking.set()
+            try:
+                self.engine.say(text)
+                self.engine.runAndWait()
+            except RuntimeError as e:
+                print("Speech Error:", str(e))
+            finally:
+                self.speaking.clear()
+                self._done(1)
+
+    def _done(self, count):
+        with self.idle:
+            self.pending = max(0, self.pending - count)
+            self.idle.notify_all()
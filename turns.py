@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+MAX_TURNS = int(os.environ.get("HISTORY_MAX_TURNS", 200))   # Turns kept in memory; older ones live only on disk
+
+ROLE_PREFIXES = {"user": "User: ", "assistant": "SYSTEM: "}   # How each role reads in a prompt
+
+
+@dataclass(slots=True)
+class Attachment:
+    """Bulky material a turn refers to, such as command output or a page summary."""
+    kind: str       # e.g. "command output", "url summary"
+    source: str     # The command line or URL it came from
+    text: str
+
+    def to_entry(self):
+        return {"kind": self.kind, "source": self.source, "text": self.text}
+
+
+@dataclass(slots=True)
+class Turn:
+    """One entry of the conversation. Its prompt text is rendered once and then reused."""
+    role: str                   # "user", "assistant" or "system"
+    text: str
+    attachments: tuple = ()
+    timestamp: float = field(default_factory=time.time)
+    rendered: str = field(default=None, repr=False, compare=False)
+
+    def render(self):
+        """Returns the turn as prompt text, e.g. "User: ..." followed by any attachments."""
+        if self.rendered is None:
+            parts = [ROLE_PREFIXES.get(self.role, "") + self.text]
+            for attachment in self.attachments:
+                parts.append(f"[{attachment.kind} from {attachment.source}]\n{attachment.text}")
+            self.rendered = "\n".join(parts)
+        return self.rendered
+
+    __str__ = render
+
+    def to_entry(self):
+        """JSON-ready form for the history store."""
+        entry = {"role": self.role, "text": self.text}
+        if self.attachments:
+            entry["attachments"] = [attachment.to_entry() for attachment in self.attachments]
+        return entry
+
+    @classmethod
+    def from_entry(cls, entry, timestamp=None):
+        """Builds a Turn from a stored entry, or from the plain strings and dicts older code appends."""
+        timestamp = time.time() if timestamp is None else timestamp
+        if isinstance(entry, dict) and "role" in entry:
+            attachments = tuple(Attachment(**item) for item in entry.get("attachments", ()))
+            return cls(entry["role"], entry.get("text", ""), attachments, timestamp)
+        if isinstance(entry, dict):
+            return cls("system", "; ".join(f"{key}: {value}" for key, value in entry.items()), timestamp=timestamp)
+        text = str(entry)
+        for role, prefix in ROLE_PREFIXES.items():
+            if text.startswith(prefix):
+                return cls(role, text[len(prefix):], timestamp=timestamp)
+        return cls("system", text, timestamp=timestamp)
+
+
+def render_entry(entry):
+    """Prompt text for any stored history entry, old or new format."""
+    return Turn.from_entry(entry, 0).render()
+
+
+class TurnLog:
+    """The session's conversation: a bounded deque of Turns in front of the history store.
+
+    It stands in for the old conversation_history list. append() still takes strings and dicts,
+    len() counts every turn of the session and slices use those same positions, so callers that
+    remember an index keep working after old turns have been dropped. Turns that fall off the
+    front are written to the store first if save() has not already done so.
+    """
+
+    def __init__(self, store=None, maxlen=MAX_TURNS):
+        self.store = store
+        self.maxlen = maxlen
+        self.turns = deque()
+        self.start = 0          # Session position of turns[0]
+        self.saved = 0          # Turns before this position are in the store
+        self.spilled = []       # Turns saved while being dropped, reported by the next save()
+        self.lock = threading.RLock()
+
+    def append(self, item):
+        """Adds a Turn (or a legacy string/dict) and returns the Turn."""
+        turn = item if isinstance(item, Turn) else Turn.from_entry(item)
+        with self.lock:
+            self.turns.append(turn)
+            while len(self.turns) > self.maxlen:
+                oldest = self.turns[0]
+                if self.saved <= self.start and self.store is not None:
+                    self.store.append(oldest.to_entry(), oldest.timestamp)
+                    self.spilled.append(oldest)
+                self.saved = max(self.saved, self.start + 1)
+                self.turns.popleft()
+                self.start += 1
+        return turn
+
+    def __len__(self):
+        with self.lock:
+            return self.start + len(self.turns)
+
+    def __getitem__(self, index):
+        """Returns turns by session position. Positions that were dropped are skipped in slices."""
+        with self.lock:
+            total = self.start + len(self.turns)
+            if isinstance(index, slice):
+                first, stop, step = index.indices(total)
+                first = max(first, self.start)
+                return [self.turns[i - self.start] for i in range(first, stop, step)]
+            if index < 0:
+                index += total
+            if not self.start <= index < total:
+                raise IndexError("turn is no longer in memory")
+            return self.turns[index - self.start]
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.turns))
+
+    def save(self):
+        """Writes turns that are not in the store yet and returns every turn saved since the last call."""
+        with self.lock:
+            unsaved = list(self.turns)[self.saved - self.start:]
+            if self.store is not None:
+                for turn in unsaved:
+                    self.store.append(turn.to_entry(), turn.timestamp)
+            self.saved = self.start + len(self.turns)
+            pending, self.spilled = self.spilled + unsaved, []
+            return pending
@@ -0,0 +1,117 @@
+import math
+import os
+from array import array
+from collections import deque
+
+try:
+    import webrtcvad
+except ImportError:   # The energy detector below is used instead
+    webrtcvad = None
+
+FRAME_MS = 30                 # Frame length fed to the detector (10, 20 or 30 for WebRTC)
+START_FRAMES = 3              # Consecutive speech frames needed to start an utterance
+END_SILENCE_MS = int(os.environ.get("VAD_END_SILENCE_MS", 800))   # Pause that ends an utterance
+PADDING_MS = 300              # Audio kept from just before speech starts
+SAMPLE_WIDTH = 2              # 16-bit PCM
+
+
+def frame_rms(frame):
+    """Root mean square level of a 16-bit little-endian PCM frame."""
+    samples = array("h", frame)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+
+class EnergyVAD:
+    """Speech detector based on frame energy against an adaptive noise floor."""
+
+    def __init__(self, rate, min_threshold=300.0, margin=3.0):
+        self.rate = rate
+        self.min_threshold = min_threshold
+        self.margin = margin
+        self.noise = min_threshold / margin
+
+    def is_speech(self, frame):
+        level = frame_rms(frame)
+        speech = level > max(self.min_threshold, self.noise * self.margin)
+        if not speech:
+            self.noise = 0.95 * self.noise + 0.05 * level   # Track background noise slowly
+        return speech
+
+
+class WebRTCVAD:
+    """Wrapper around the webrtcvad package (frames must be 10, 20 or 30 ms)."""
+
+    def __init__(self, rate, aggressiveness=2):
+        self.rate = rate
+        self.vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame):
+        return self.vad.is_speech(frame, self.rate)
+
+
+def get_vad(rate):
+    """Returns the WebRTC detector when installed and the rate suits it, otherwise the energy one."""
+    if webrtcvad is not None and rate in (8000, 16000, 32000, 48000):
+        return WebRTCVAD(rate)
+    return EnergyVAD(rate)
+
+
+class Endpointer:
+    """Cuts a stream of PCM into one utterance using a voice activity detector.
+
+    Leading silence is dropped (apart from a little padding), trailing silence is held back
+    and only released if speech resumes, and the utterance ends after end_silence_ms of quiet.
+    """
+
+    def __init__(self, rate, detector=None, frame_ms=FRAME_MS, end_silence_ms=END_SILENCE_MS, padding_ms=PADDING_MS):
+        self.rate = rate
+        self.detector = detector or get_vad(rate)
+        self.frame_bytes = int(rate * frame_ms / 1000) * SAMPLE_WIDTH
+        self.end_frames = max(1, end_silence_ms // frame_ms)
+        self.padding = deque(maxlen=max(1, padding_ms // frame_ms))
+        self.reset()
+
+    def reset(self):
+        self.pending = b""
+        self.padding.clear()
+        self.silence = []
+        self.speech_run = 0
+        self.triggered = False
+        self.done = False
+
+    def process(self, chunk):
+        """Feeds raw PCM and returns the speech audio that can be passed downstream now."""
+        out = []
+        data = self.pending + bytes(chunk)
+        position = 0
+        while len(data) - position >= self.frame_bytes and not self.done:
+            frame = data[position:position + self.frame_bytes]
+            position += self.frame_bytes
+            speech = self.detector.is_speech(frame)
+
+            if not self.triggered:
+                self.padding.append(frame)
+                self.speech_run = self.speech_run + 1 if speech else 0
+                if self.speech_run >= START_FRAMES:
+                    self.triggered = True
+                    out.extend(self.padding)
+                    self.padding.clear()
+            elif speech:
+                out.extend(self.silence)
+                self.silence = []
+                out.append(frame)
+            else:
+                self.silence.append(frame)
+                if len(self.silence) >= self.end_frames:
+                    self.silence = []   # Trailing silence is trimmed
+                    self.done = True
+        self.pending = data[position:]
+        return b"".join(out)
+
+
+def trim_silence(pcm, rate, detector=None):
+    """Returns a complete 16-bit mono recording with leading and trailing silence removed."""
+    endpointer = Endpointer(rate, detector=detector, end_silence_ms=10 ** 9)
+    return endpointer.process(pcm)
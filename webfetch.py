@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import tracing
+
+CACHE_DIR = "web_cache"        # Page bodies plus their ETag / Last-Modified validators
+MAX_BYTES = 2 * 1024 * 1024    # Stop downloading a page after this many bytes
+TIMEOUT = (5, 10)              # Connect and read timeouts in seconds
+WORKERS = 6                    # Pages fetched and summarized at the same time
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; VoiceSync)"}
+
+session = requests.Session()
+session.headers.update(HEADERS)
+_adapter = HTTPAdapter(pool_connections=WORKERS, pool_maxsize=WORKERS)
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
+
+
+def _cache_paths(url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, key + ".body"), os.path.join(CACHE_DIR, key + ".json")
+
+
+def _read_cache(url):
+    body_path, meta_path = _cache_paths(url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "r", encoding="utf-8") as f:
+            return meta, f.read()
+    except (OSError, ValueError):
+        return None, None
+
+
+def _write_cache(url, response, text):
+    if not (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+        return   # Nothing to revalidate against later
+    body_path, meta_path = _cache_paths(url)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(body_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"url": url, "etag": response.headers.get("ETag"),
+                   "last_modified": response.headers.get("Last-Modified")}, f)
+
+
+def fetch(url, max_bytes=MAX_BYTES, timeout=TIMEOUT):
+    """Downloads a page (at most max_bytes) and returns its text, or "" on failure.
+
+    Cached copies are revalidated with If-None-Match / If-Modified-Since, so an unchanged
+    page costs one 304 reply instead of a full download.
+    """
+    with tracing.span("fetch", url=url) as info:
+        text = _fetch(url, max_bytes, timeout, info)
+        info["chars"] = len(text)
+        return text
+
+
+def _fetch(url, max_bytes, timeout, info):
+    meta, cached = _read_cache(url)
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+            info["status"] = response.status_code
+            if response.status_code == 304 and cached is not None:
+                return cached
+            response.raise_for_status()
+            body = bytearray()
+            for block in response.iter_content(chunk_size=65536):
+                body += block
+                if len(body) >= max_bytes:
+                    del body[max_bytes:]
+                    break
+            text = body.decode(response.encoding or "utf-8", errors="replace")
+            _write_cache(url, response, text)
+            return text
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching web content: {e}")
+        return ""
+    except OSError as e:
+        print(f"Error caching web content: {e}")
+        return ""
+
+
+def summarize_all(urls, summarize):
+    """Fetches and summarizes every URL in parallel, yielding (url, summary) in the original order.
+
+    Each URL goes through fetch -> summarize on its own worker, so the total time is about
+    that of the slowest URL rather than the sum of all of them.
+    """
+    def work(url):
+        text = fetch(url)
+        return summarize(text) if text else "Failed to fetch the page."
+
+    pool = ThreadPoolExecutor(max_workers=WORKERS)
+    try:
+        futures = [(url, pool.submit(tracing.bind(work), url)) for url in dict.fromkeys(urls)]
+        for url, future in futures:
+            yield url, future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)